@@ -0,0 +1,156 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Max, Sum
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import condition, require_http_methods
+
+from .decorators import require_auth, query_budget, idempotent
+from .forms import FoodForm
+from .helpers import (
+    complete_assignment,
+    COMPLETION_ERRORS,
+    get_history_queryset,
+    paginate_by_cursor,
+    parse_cursor,
+)
+from .instrumentation import span
+from .models import FavouriteFood, FormSummary
+from .upload_handlers import LimitedJPEGUploadHandler
+
+
+def rows_etag(summaries, rows, *extra):
+    # the summaries' counters and the rows' highest id change whenever a row is
+    # assigned, completed, imported or deleted, and both are index lookups
+    # where counting the rows themselves is a scan
+    version = summaries.aggregate(
+        open_count=Sum("open_count"),
+        completed_count=Sum("completed_count"),
+        last_completed_at=Max("last_completed_at"),
+    )
+    version["last_id"] = rows.order_by("-pk").values_list("pk", flat=True).first()
+
+    return hashlib.md5(
+        repr((sorted(version.items()),) + extra).encode("utf-8")
+    ).hexdigest()
+
+
+def pending_etag(request):
+    return rows_etag(
+        FormSummary.objects.filter(user=request.user),
+        FavouriteFood.objects.for_user(request.user, completed=False),
+        request.user.first_name,
+        request.user.last_name,
+        request.user.email,
+    )
+
+
+def history_etag(request):
+    summaries = FormSummary.objects.all()
+
+    if not request.user.is_superuser:
+        summaries = summaries.filter(user=request.user)
+
+    return rows_etag(
+        summaries,
+        get_history_queryset(request.user),
+        request.user.pk,
+        request.GET.get("after"),
+        settings.HISTORY_PAGE_SIZE,
+    )
+
+
+def food_to_dict(food):
+    return {
+        "id": food.pk,
+        "user_id": food.user_id,
+        "name": food.name,
+        "email": food.email,
+        "telephone": food.telephone,
+        "dob": food.dob.isoformat() if food.dob else None,
+        "food": food.food,
+        "completed_at": food.completed_at.isoformat() if food.completed_at else None,
+        "photo": reverse("food_photo", args=[food.pk]) if food.photo else None,
+        "thumbnail": reverse("food_thumbnail", args=[food.pk]) if food.photo else None,
+    }
+
+
+@require_http_methods(["GET"])
+@query_budget(queries=5)
+@require_auth(message="Please login in!")
+@condition(etag_func=pending_etag)
+def pending(request):
+
+    name = request.user.first_name + " " + request.user.last_name
+    forms = FavouriteFood.objects.for_user(request.user, completed=False)
+
+    data = {
+        "forms": [
+            {"id": pk, "name": name, "email": request.user.email}
+            for pk in forms.order_by("id").values_list("pk", flat=True)
+        ]
+    }
+    data["count"] = len(data["forms"])
+
+    return JsonResponse(data)
+
+
+@require_http_methods(["GET"])
+@query_budget(queries=5)
+@require_auth(message="Please login in!")
+@condition(etag_func=history_etag)
+def history(request):
+
+    foods = get_history_queryset(request.user)
+    after = parse_cursor(request.GET.get("after"))
+
+    if after:
+        foods = foods.filter(id__gt=after)
+
+    foods, next_cursor = paginate_by_cursor(foods, page_size=settings.HISTORY_PAGE_SIZE)
+
+    return JsonResponse(
+        {"foods": [food_to_dict(food) for food in foods], "next_cursor": next_cursor}
+    )
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@query_budget(queries=8)
+@require_auth(message="Please login in!")
+@idempotent
+def complete(request, assigned_form_id=None):
+
+    upload_handler = LimitedJPEGUploadHandler(request)
+    request.upload_handlers = [upload_handler]
+
+    return _complete(request, assigned_form_id, upload_handler)
+
+
+@csrf_protect
+def _complete(request, assigned_form_id, upload_handler):
+
+    submitted_form = FoodForm(request.POST, request.FILES)
+
+    if upload_handler.error:
+        return JsonResponse({"errors": {"photo": [upload_handler.error]}}, status=400)
+
+    with span("form"):
+        is_valid = submitted_form.is_valid()
+
+    if not is_valid:
+        return JsonResponse(
+            {"errors": submitted_form.errors.get_json_data()}, status=400
+        )
+
+    outcome = complete_assignment(
+        submitted_form=submitted_form, user=request.user, record_id=assigned_form_id
+    )
+
+    if outcome in COMPLETION_ERRORS:
+        message, status = COMPLETION_ERRORS[outcome]
+        return JsonResponse({"error": message}, status=status)
+
+    return JsonResponse({"id": assigned_form_id, "completed": True})
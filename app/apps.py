@@ -1,5 +1,28 @@
 from django.apps import AppConfig
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.core import checks
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class AuthenticateConfig(AppConfig):
     name = "app"
+
+    def ready(self):
+        from django.contrib.auth.models import User
+
+        from .auth import forget_session, forget_user, remember_login
+        from .checks import check_shared_cache
+        from .db import check_connections, configure_sqlite
+        from .models import FavouriteFood
+        from .summaries import discount_deleted_form
+
+        checks.register(check_shared_cache)
+        connection_created.connect(configure_sqlite)
+        request_started.connect(check_connections)
+        user_logged_in.connect(remember_login)
+        user_logged_out.connect(forget_session)
+        post_save.connect(forget_user, sender=User)
+        post_delete.connect(forget_user, sender=User)
+        post_delete.connect(discount_deleted_form, sender=FavouriteFood)
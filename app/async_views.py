@@ -0,0 +1,59 @@
+from asgiref.sync import sync_to_async
+
+from . import views
+from .threads import run_sync
+
+# Django has no async ORM yet, so these views only hold the event loop while
+# the request is waiting on the client. Each runs its sync view, decorators and
+# all, in a single call to the bounded app.threads pool, so the session, the
+# user and the view's own queries share that thread's connection.
+
+
+async def home(request):
+    return await run_sync(views.home, request)
+
+
+async def complete_forms(request, assigned_form_id=None):
+    # the ASGI handler has already spooled the upload by the time this runs,
+    # so a slow client never holds one of the pool's threads
+    return await run_sync(views.complete_forms, request, assigned_form_id)
+
+
+complete_forms.csrf_exempt = True
+
+
+async def history(request):
+    return stream_async(await run_sync(views.history, request))
+
+
+async def export_history(request):
+    return stream_async(await run_sync(views.export_history, request))
+
+
+async def food_photo(request, pk=None, thumbnail=False):
+    return await run_sync(views.food_photo, request, pk=pk, thumbnail=thumbnail)
+
+
+def stream_async(response):
+    # Django 3.1's ASGI handler iterates streaming content on the event loop,
+    # where the rows can't be queried, so app.upload_handlers.LimitedASGIHandler
+    # sends this async version instead
+    if response.streaming:
+        response.async_streaming_content = pull_chunks(response.streaming_content)
+
+    return response
+
+
+async def pull_chunks(chunks):
+    # each chunk is only read when the previous one has been sent, and always
+    # in the same thread, so the rows' cursor stays on one connection
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+
+    while True:
+        chunk = await next_chunk(chunks, None)
+
+        if chunk is None:
+            return
+
+        yield chunk
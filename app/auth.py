@@ -0,0 +1,170 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+class UserCache:
+    # a small LRU of session key -> (user, version) for this process, so
+    # authenticated requests skip loading the user on a hit
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def get(self, session_key):
+        with self.lock:
+            entry = self.entries.get(session_key)
+
+            if entry is None:
+                return None
+
+            user, version, expires_at = entry
+
+            if expires_at < time.monotonic():
+                self._remove(session_key)
+                return None
+
+            self.entries.move_to_end(session_key)
+
+        # views may set attributes on request.user, so each request gets a copy
+        return copy.copy(user), version
+
+    def set(self, session_key, user, version=None):
+        expires_at = time.monotonic() + settings.AUTH_USER_CACHE_TIMEOUT
+
+        with self.lock:
+            self._remove(session_key)
+            self.entries[session_key] = (user, version, expires_at)
+            self.sessions.setdefault(user.pk, set()).add(session_key)
+
+            while len(self.entries) > settings.AUTH_USER_CACHE_SIZE:
+                self._remove(next(iter(self.entries)))
+
+    def discard(self, session_key):
+        with self.lock:
+            self._remove(session_key)
+
+    def discard_user(self, user_id):
+        with self.lock:
+            for session_key in list(self.sessions.get(user_id, ())):
+                self._remove(session_key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sessions.clear()
+
+    def _remove(self, session_key):
+        entry = self.entries.pop(session_key, None)
+
+        if entry is not None:
+            session_keys = self.sessions[entry[0].pk]
+            session_keys.discard(session_key)
+
+            if not session_keys:
+                del self.sessions[entry[0].pk]
+
+
+user_cache = UserCache()
+
+
+def user_version_key(user_id):
+    return "auth_user_version:{}".format(user_id)
+
+
+def user_version(user_id):
+    cache = caches["shared"]
+    key = user_version_key(user_id)
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_user_version(user_id):
+    caches["shared"].set(user_version_key(user_id), uuid.uuid4().hex, timeout=None)
+
+
+def get_user(request):
+    session_key = request.session.session_key
+
+    if not session_key or not settings.AUTH_USER_CACHE_TIMEOUT:
+        return auth.get_user(request)
+
+    entry = user_cache.get(session_key)
+
+    # any worker logging the user out or saving them (a password change
+    # included) moves their version on in the shared cache, so a cached user
+    # is only trusted while it matches. The session is still read, so one that
+    # has expired, been flushed or holds another password's hash falls through
+    if entry is not None:
+        user, version = entry
+
+        if (
+            version == caches["shared"].get(user_version_key(user.pk))
+            and request.session.get(auth.SESSION_KEY) == str(user.pk)
+            and session_hash_matches(request.session, user)
+        ):
+            return user
+
+    # the version is read before the user is, so a change made in between
+    # leaves this entry stale rather than the stale user current
+    user_id = request.session.get(auth.SESSION_KEY)
+    version = user_version(user_id) if user_id else None
+    user = auth.get_user(request)
+
+    if user.is_authenticated and version is not None and str(user.pk) == user_id:
+        user_cache.set(session_key, user, version)
+
+    return user
+
+
+def session_hash_matches(session, user):
+    session_hash = session.get(auth.HASH_SESSION_KEY)
+
+    return bool(session_hash) and constant_time_compare(
+        session_hash, user.get_session_auth_hash()
+    )
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        request.user = SimpleLazyObject(lambda: get_user(request))
+
+
+def remember_login(sender, request, user, **kwargs):
+    if request is not None and request.session.session_key:
+        user_cache.discard(request.session.session_key)
+
+    # the version is made here so a login, not the first page after it, pays
+    # for writing it to the shared cache
+    user_version(user.pk)
+
+
+def forget_session(sender, request, user=None, **kwargs):
+    if request is not None and request.session.session_key:
+        user_cache.discard(request.session.session_key)
+
+    # other workers only learn of a logout through the user's version
+    if user is not None:
+        bump_user_version(user.pk)
+
+
+def forget_user(sender, instance, update_fields=None, **kwargs):
+    user_cache.discard_user(instance.pk)
+
+    # logging in saves last_login alone, which cached users can do without
+    if update_fields is None or set(update_fields) != {"last_login"}:
+        bump_user_version(instance.pk)
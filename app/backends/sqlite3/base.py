@@ -0,0 +1,17 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Django's SQLite backend opens atomic blocks with a plain BEGIN, which
+    # takes the write lock only at the first write; OPTIONS["transaction_mode"]
+    # (e.g. "IMMEDIATE") takes it up front, as Django 5.1 later added itself
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop("transaction_mode", None)
+
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict["OPTIONS"].get("transaction_mode")
+        self.cursor().execute("BEGIN {}".format(mode) if mode else "BEGIN")
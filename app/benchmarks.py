@@ -0,0 +1,306 @@
+import json
+import platform
+import statistics
+import time
+import timeit
+import tracemalloc
+from datetime import date
+from io import BytesIO
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.forms import modelform_factory
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from .forms import FoodForm, validate_food_rows
+from .models import FavouriteFood
+from .validations import date_validator, image_validator, phone_validator
+
+PASSWORD = "benchmark-password"
+
+FLOWS = (
+    "login_user",
+    "home",
+    "history",
+    "display_users",
+    "assign_forms",
+    "complete_forms",
+)
+
+
+def seed(users, rows, open_forms):
+    FavouriteFood.objects.all().delete()
+    User.objects.all().delete()
+
+    # hashing once and reusing the hash keeps seeding fast, logins still pay
+    # the full hasher cost
+    password = make_password(PASSWORD)
+
+    User.objects.create(username="bench_admin", is_superuser=True, password=password)
+    bench_user = User.objects.create(username="bench_user", password=password)
+
+    User.objects.bulk_create(
+        (
+            User(
+                username="user{}".format(index),
+                email="user{}@example.com".format(index),
+                password=password,
+            )
+            for index in range(users)
+        ),
+        batch_size=1000,
+    )
+    user_ids = list(
+        User.objects.filter(is_superuser=False).values_list("pk", flat=True)
+    )
+
+    FavouriteFood.objects.bulk_create(
+        (
+            FavouriteFood(
+                user_id=user_ids[index % len(user_ids)],
+                name="user {}".format(index),
+                email="user{}@example.com".format(index),
+                telephone="07400000000",
+                photo="uploads/food.jpg",
+                dob="2000-01-01",
+                food="food {}".format(index),
+                completed=True,
+            )
+            for index in range(rows)
+        ),
+        batch_size=1000,
+    )
+    FavouriteFood.objects.bulk_create(
+        FavouriteFood(user=bench_user) for _ in range(open_forms)
+    )
+
+    return bench_user
+
+
+def sample_photo(size=(1600, 1200)):
+    output = BytesIO()
+    Image.new("RGB", size, color=(200, 80, 40)).save(output, "JPEG")
+    return output.getvalue()
+
+
+def logged_in_client(username):
+    client = Client()
+    client.login(username=username, password=PASSWORD)
+    return client
+
+
+def flow_requests(flow, bench_user, iterations, photo):
+    if flow == "login_user":
+        for _ in range(iterations):
+            client = Client()
+            yield lambda: client.post(
+                "/", {"username": "bench_user", "password": PASSWORD}
+            )
+
+    elif flow in ("home", "history", "display_users"):
+        client = logged_in_client("bench_admin" if flow != "home" else "bench_user")
+        url = {
+            "home": "/dashboard/",
+            "history": "/history/",
+            "display_users": "/users/",
+        }
+        for _ in range(iterations):
+            yield lambda: client.get(url[flow])
+
+    elif flow == "assign_forms":
+        client = logged_in_client("bench_admin")
+        for _ in range(iterations):
+            yield lambda: client.post("/assign-forms/{}".format(bench_user.pk))
+
+    elif flow == "complete_forms":
+        client = logged_in_client("bench_user")
+        FavouriteFood.objects.bulk_create(
+            FavouriteFood(user=bench_user) for _ in range(iterations)
+        )
+        form_ids = FavouriteFood.objects.filter(
+            user=bench_user, completed=False
+        ).values_list("pk", flat=True)
+
+        for form_id in list(form_ids[:iterations]):
+            values = {
+                "name": "bench user",
+                "email": "bench@example.com",
+                "telephone": "07400000000",
+                "dob": "2000-01-01",
+                "food": "food",
+                "assigned_form_id": form_id,
+            }
+            yield lambda form_id=form_id, values=values: client.post(
+                "/complete-forms/{}".format(form_id),
+                {**values, "photo": SimpleUploadedFile("food.jpg", photo)},
+            )
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    index = min(int(round(fraction * (len(samples) - 1))), len(samples) - 1)
+    return samples[index]
+
+
+def measure(flow, bench_user, iterations, photo):
+    latencies = []
+    queries = []
+
+    for request in flow_requests(flow, bench_user, iterations, photo):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = request()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        if response.status_code >= 400:
+            raise RuntimeError("{} answered {}".format(flow, response.status_code))
+
+        queries.append(len(context.captured_queries))
+
+    # tracing allocations slows everything down, so peak memory comes from a
+    # separate request
+    tracemalloc.start()
+    for request in flow_requests(flow, bench_user, 1, photo):
+        request()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "flow": flow,
+        "iterations": iterations,
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies), 3),
+            "p50": round(percentile(latencies, 0.5), 3),
+            "p90": round(percentile(latencies, 0.9), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(max(latencies), 3),
+        },
+        "queries": {"min": min(queries), "max": max(queries)},
+        "peak_memory_kb": round(peak_memory / 1024, 1),
+    }
+
+
+def run(sizes, iterations, flows=FLOWS, open_forms=20):
+    photo = sample_photo()
+    results = []
+
+    for users, rows in sizes:
+        bench_user = seed(users, rows, open_forms)
+
+        for flow in flows:
+            result = measure(flow, bench_user, iterations, photo)
+            results.append({"users": users, "rows": rows, **result})
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "iterations": iterations,
+            "open_forms": open_forms,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current):
+    previous = {
+        (result["users"], result["rows"], result["flow"]): result
+        for result in baseline["results"]
+    }
+
+    for result in current["results"]:
+        key = (result["users"], result["rows"], result["flow"])
+
+        if key not in previous:
+            continue
+
+        before = previous[key]
+        yield {
+            "users": result["users"],
+            "rows": result["rows"],
+            "flow": result["flow"],
+            "p50_ratio": round(
+                result["latency_ms"]["p50"] / (before["latency_ms"]["p50"] or 1), 3
+            ),
+            "queries_delta": result["queries"]["max"] - before["queries"]["max"],
+        }
+
+
+def sample_food_rows(count):
+    return [
+        {
+            "name": "Bench User {}".format(n),
+            "email": "bench{}@example.com".format(n),
+            "telephone": "07{:09d}".format(n),
+            "dob": "03/28/2010",
+            "food": "Pizza",
+        }
+        for n in range(count)
+    ]
+
+
+def time_per_call(function, iterations):
+    # best of three runs, in microseconds per call
+    timer = timeit.Timer(function)
+    return min(timer.repeat(repeat=3, number=iterations)) / iterations * 1e6
+
+
+def measure_validation(iterations=10000, rows=200, baselines=None):
+    # baselines maps a validator's name to an older version to compare it with
+    baselines = baselines or {}
+    photo = SimpleUploadedFile("photo.jpg", b"")
+    dob = date(2010, 3, 28)
+    food_rows = sample_food_rows(rows)
+    fields = ("name", "email", "telephone", "dob", "food")
+
+    # FoodForm restricted to the imported fields, the per-row baseline
+    RowForm = modelform_factory(FavouriteFood, form=FoodForm, fields=fields)
+
+    for name in set(RowForm.base_fields) - set(fields):
+        del RowForm.base_fields[name]
+
+    validators = [
+        ("phone_validator", phone_validator, "07123456789"),
+        ("date_validator", date_validator, dob),
+        ("image_validator", image_validator, photo),
+    ]
+    results = []
+
+    for name, validator, value in validators:
+        after_us = time_per_call(lambda: validator(value), iterations)
+        result = {"case": name, "after_us": round(after_us, 3)}
+
+        if name in baselines:
+            before_us = time_per_call(lambda: baselines[name](value), iterations)
+            result["before_us"] = round(before_us, 3)
+            result["speedup"] = round(before_us / after_us, 2)
+
+        results.append(result)
+
+    number = max(iterations // 1000, 1)
+    before_us = time_per_call(
+        lambda: [RowForm(row).is_valid() for row in food_rows], number
+    )
+    after_us = time_per_call(
+        lambda: validate_food_rows(food_rows, fields=fields), number
+    )
+    results.append(
+        {
+            "case": "food_rows",
+            "before_us": round(before_us, 3),
+            "after_us": round(after_us, 3),
+            "speedup": round(before_us / after_us, 2),
+        }
+    )
+
+    return results
+
+
+def dumps(report):
+    return json.dumps(report, indent=2, sort_keys=True)
@@ -0,0 +1,118 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    # a cache shared by every worker on the host through one SQLite file, kept
+    # apart from the application database so it costs no queries there
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, "connection", None)
+
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB, expires REAL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)"
+            )
+            self.local.connection = connection
+
+        return connection
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self.cull()
+
+        # only an expired entry may be replaced, so of two workers adding the
+        # same key exactly one succeeds
+        cursor = self.connection.execute(
+            "INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, "
+            "expires = excluded.expires WHERE cache.expires <= ?",
+            (key, self.dumps(value), self.get_backend_timeout(timeout), time.time()),
+        )
+
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self.connection.execute(
+            "SELECT value FROM cache WHERE key = ? "
+            "AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self.cull()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, self.dumps(value), self.get_backend_timeout(timeout)),
+        )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self.connection.execute(
+            "UPDATE cache SET expires = ? WHERE key = ? "
+            "AND (expires IS NULL OR expires > ?)",
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self.connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    def clear(self):
+        self.connection.execute("DELETE FROM cache")
+
+    def cull(self):
+        # a couple of expired entries go with each write, and past MAX_ENTRIES
+        # the ones closest to expiring make room, as in Django's own backends
+        connection = self.connection
+        connection.execute(
+            "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache "
+            "WHERE expires <= ? ORDER BY expires LIMIT 2)",
+            (time.time(),),
+        )
+        (count,) = connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+
+        if count >= self._max_entries:
+            # a CULL_FREQUENCY of 0 empties the cache
+            culled = count // self._cull_frequency if self._cull_frequency else count
+            connection.execute(
+                "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache "
+                "ORDER BY expires IS NULL, expires LIMIT ?)",
+                (max(culled, 1),),
+            )
+
+    def dumps(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
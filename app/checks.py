@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Error
+
+
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get("shared", {}).get("BACKEND", "")
+
+    if settings.DEBUG or not backend.endswith(".LocMemCache"):
+        return []
+
+    return [
+        Error(
+            'The "shared" cache must be shared between processes.',
+            hint="Use app.cache.SQLiteCache, memcached or redis.",
+            id="app.E001",
+        )
+    ]
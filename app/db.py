@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db import connections
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite" or connection.is_in_memory_db():
+        return
+
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute("PRAGMA {} = {}".format(name, value))
+
+
+def check_connections(sender, **kwargs):
+    # a persistent connection may have been dropped by the server since the
+    # last request; closing it here makes the next query reconnect
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and connection.settings_dict["CONN_MAX_AGE"]
+            and not connection.in_atomic_block
+            and not connection.is_usable()
+        ):
+            connection.close()
@@ -1,20 +1,77 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
 from django.shortcuts import redirect
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
+
+from .routers import replica_reads
+from .threads import run_sync
+from .throttle import give_tokens, take_tokens, throttle_keys
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_PARAM = "idempotency_key"
+
+IDEMPOTENCY_PENDING = "pending"
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - start
 
 
 def require_auth(message="authentication failed!", redirect_view=None):
     def decorator(view_function):
+        @wraps(view_function)
         def wrapper(request, *args, **kwargs):
 
             if not request.user.is_authenticated:
+                return reject()
 
-                if redirect_view:
+            return view_function(request, *args, **kwargs)
 
-                    return redirect(redirect_view)
+        @wraps(view_function)
+        async def async_wrapper(request, *args, **kwargs):
 
-                return HttpResponse(message, status=400)
+            # request.user is loaded lazily from the session and the database,
+            # which can't be touched from the event loop
+            if not await run_sync(lambda: request.user.is_authenticated):
+                return reject()
 
-            return view_function(request, *args, **kwargs)
+            return await view_function(request, *args, **kwargs)
+
+        def reject():
+            if redirect_view:
+
+                return redirect(redirect_view)
+
+            return HttpResponse(message, status=400)
+
+        if asyncio.iscoroutinefunction(view_function):
+            return async_wrapper
 
         return wrapper
 
@@ -23,18 +80,239 @@ def require_auth(message="authentication failed!", redirect_view=None):
 
 def require_admin(message="Unauthorized!", redirect_view=None):
     def decorator(view_function):
+        @wraps(view_function)
         def wrapper(request, *args, **kwargs):
 
             if not request.user.is_superuser:
+                return reject()
 
-                if redirect_view:
+            return view_function(request, *args, **kwargs)
 
-                    return redirect(redirect_view)
+        @wraps(view_function)
+        async def async_wrapper(request, *args, **kwargs):
 
-                return HttpResponse(message, status=401)
+            if not await run_sync(lambda: request.user.is_superuser):
+                return reject()
 
-            return view_function(request, *args, **kwargs)
+            return await view_function(request, *args, **kwargs)
+
+        def reject():
+            if redirect_view:
+
+                return redirect(redirect_view)
+
+            return HttpResponse(message, status=401)
+
+        if asyncio.iscoroutinefunction(view_function):
+            return async_wrapper
 
         return wrapper
 
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+def query_budget(queries, time_ms=None):
+    def decorator(view_function):
+        @wraps(view_function)
+        def wrapper(request, *args, **kwargs):
+
+            stats = QueryStats()
+
+            with count_queries(stats):
+                response = view_function(request, *args, **kwargs)
+
+            request.query_stats = stats
+            budget = (
+                view_function.__name__,
+                queries,
+                time_ms or settings.QUERY_BUDGET_TIME_MS,
+            )
+
+            # streamed rows are queried after the view returns, while the
+            # response is sent, so those budgets are checked once it is drained
+            if response.streaming and not isinstance(response, FileResponse):
+                response.streaming_content = counted_stream(
+                    response.streaming_content, stats, budget
+                )
+            else:
+                check_budget(stats, *budget)
+
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def count_queries(stats):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+
+        yield
+
+
+def counted_stream(content, stats, budget):
+    # only the stream's own work is counted, one chunk at a time, so nothing
+    # else the thread does between chunks is, and a stream that is never
+    # drained leaves no wrapper installed
+    content = iter(content)
+    done = object()
+
+    while True:
+        with count_queries(stats):
+            chunk = next(content, done)
+
+        if chunk is done:
+            break
+
+        yield chunk
+
+    check_budget(stats, *budget)
+
+
+def check_budget(stats, name, queries, max_time_ms):
+    over_count = stats.count > queries
+
+    if not over_count and stats.time * 1000 <= max_time_ms:
+        return
+
+    message = "{} ran {} queries in {:.1f}ms, budget is {} in {}ms".format(
+        name, stats.count, stats.time * 1000, queries, max_time_ms
+    )
+
+    # timings depend on the machine, so only the query count is ever fatal
+    if over_count and settings.QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded(message)
+
+    logger.warning(message)
+
+
+def read_from_replica(view_function):
+    @wraps(view_function)
+    def wrapper(request, *args, **kwargs):
+
+        token = replica_reads.set(True)
+
+        try:
+            return view_function(request, *args, **kwargs)
+
+        finally:
+            replica_reads.reset(token)
+
+    return wrapper
+
+
+def idempotent(view_function):
+    # the key comes from the query string or the Idempotency-Key header, never
+    # the body, so a repeat is answered before its upload is parsed; a replay
+    # only hands back what the first request got, so views that check CSRF
+    # themselves apply this before that check and run it on first executions
+    @wraps(view_function)
+    def wrapper(request, *args, **kwargs):
+
+        cache = caches["shared"]
+
+        key = request.headers.get("Idempotency-Key") or request.GET.get(
+            IDEMPOTENCY_KEY_PARAM
+        )
+
+        if not key:
+            return view_function(request, *args, **kwargs)
+
+        cache_key = "idempotency:{}:{}".format(
+            request.user.pk,
+            hashlib.md5((request.path + "\n" + key).encode("utf-8")).hexdigest(),
+        )
+
+        if not cache.add(
+            cache_key, IDEMPOTENCY_PENDING, timeout=settings.IDEMPOTENCY_KEY_TIMEOUT
+        ):
+            return replay_response(cache_key)
+
+        try:
+            response = view_function(request, *args, **kwargs)
+
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        # a refused CSRF check is not the outcome of the genuine request that
+        # may follow with the same key
+        forbidden = response.status_code == 403
+
+        if response.streaming or forbidden or response.status_code >= 500:
+            cache.delete(cache_key)
+
+        else:
+            cache.set(
+                cache_key,
+                (
+                    response.status_code,
+                    response["Content-Type"],
+                    response.get("Location"),
+                    response.content,
+                ),
+                timeout=settings.IDEMPOTENCY_KEY_TIMEOUT,
+            )
+
+        return response
+
+    return wrapper
+
+
+def replay_response(cache_key):
+    # a double-click usually arrives while the first request is still running,
+    # so wait a little for its outcome before giving up with a conflict
+    cache = caches["shared"]
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    stored = cache.get(cache_key)
+
+    while stored == IDEMPOTENCY_PENDING and time.monotonic() < deadline:
+        time.sleep(0.1)
+        stored = cache.get(cache_key)
+
+    if stored is None or stored == IDEMPOTENCY_PENDING:
+        return HttpResponse("This request is already being processed.", status=409)
+
+    status, content_type, location, content = stored
+
+    if location:
+        response = HttpResponseRedirect(location, status=status)
+
+    else:
+        response = HttpResponse(content, status=status, content_type=content_type)
+
+    response["Idempotent-Replayed"] = "true"
+
+    return response
+
+
+def throttle_login(view_function):
+    # runs before the view so a throttled client never reaches the password
+    # hasher; successful logins hand their tokens back
+    @wraps(view_function)
+    def wrapper(request, *args, **kwargs):
+
+        if request.method != "POST" or not settings.LOGIN_THROTTLE_ENABLED:
+            return view_function(request, *args, **kwargs)
+
+        keys = throttle_keys(request)
+        retry_after = take_tokens(keys)
+
+        if retry_after:
+            response = HttpResponse(
+                "Too many login attempts, please try again later.", status=429
+            )
+            response["Retry-After"] = str(math.ceil(retry_after))
+            return response
+
+        response = view_function(request, *args, **kwargs)
+
+        if request.user.is_authenticated:
+            give_tokens(keys)
+
+        return response
+
+    return wrapper
@@ -0,0 +1,139 @@
+import csv
+import datetime
+import json
+
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import FavouriteFood
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+EXPORT_COLUMNS = (
+    "id",
+    "username",
+    "name",
+    "email",
+    "telephone",
+    "dob",
+    "food",
+    "completed_at",
+    "photo_url",
+    "thumbnail_url",
+)
+
+
+class ExportError(ValueError):
+    pass
+
+
+def parse_day(value, name):
+    if not value:
+        return None
+
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+
+    if day is None:
+        raise ExportError("{} must be a date like 2020-01-31".format(name))
+
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def get_export_queryset(since=None, until=None, username=None):
+    foods = FavouriteFood.objects.filter(completed=True)
+    since = parse_day(since, "since")
+    until = parse_day(until, "until")
+
+    if since:
+        foods = foods.filter(completed_at__gte=since)
+
+    if until:
+        # until is inclusive, so everything before the next day
+        foods = foods.filter(completed_at__lt=until + datetime.timedelta(days=1))
+
+    if username:
+        user_id = User.objects.filter(username=username).values_list("pk", flat=True)
+        foods = foods.filter(user_id__in=user_id)
+
+    return foods.order_by("id").values_list(
+        "id",
+        "user__username",
+        "name",
+        "email",
+        "telephone",
+        "dob",
+        "food",
+        "completed_at",
+        "photo",
+    )
+
+
+# reversed in place of a row's pk, a number no part of the URL prefix has
+URL_SENTINEL_PK = 9876543210
+
+# cells a spreadsheet would read as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def photo_url_format(name, base_url):
+    # reversed once with a placeholder rather than for every row
+    url = base_url + reverse(name, args=[URL_SENTINEL_PK])
+    url = url.replace("{", "{{").replace("}", "}}")
+
+    return url.replace(str(URL_SENTINEL_PK), "{}")
+
+
+def csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+
+    return value
+
+
+def export_rows(queryset, chunk_size, base_url=""):
+    photo_url = photo_url_format("food_photo", base_url)
+    thumbnail_url = photo_url_format("food_thumbnail", base_url)
+
+    for row in queryset.iterator(chunk_size=chunk_size):
+        pk, username, name, email, telephone, dob, food, completed_at = row[:8]
+        has_photo = bool(row[8])
+
+        yield {
+            "id": pk,
+            "username": username,
+            "name": name,
+            "email": email,
+            "telephone": telephone,
+            "dob": dob.isoformat() if dob else None,
+            "food": food,
+            "completed_at": completed_at.isoformat() if completed_at else None,
+            "photo_url": photo_url.format(pk) if has_photo else None,
+            # the thumbnail view serves the photo until a thumbnail exists
+            "thumbnail_url": thumbnail_url.format(pk) if has_photo else None,
+        }
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def export_lines(rows, format):
+    if format == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_COLUMNS)
+
+        for row in rows:
+            yield writer.writerow([csv_cell(row[column]) for column in EXPORT_COLUMNS])
+
+    else:
+        for row in rows:
+            yield json.dumps(row) + "\n"
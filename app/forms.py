@@ -1,6 +1,7 @@
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django.contrib.auth.models import User
 from django import forms
+from django.core.exceptions import ValidationError
 from .validations import image_validator, date_validator, phone_validator
 from .models import FavouriteFood
 
@@ -68,3 +69,31 @@ class FoodForm(forms.ModelForm):
     class Meta:
         model = FavouriteFood
         fields = ("name", "email", "telephone", "photo", "dob", "food")
+
+
+def validate_food_rows(rows, fields=FoodForm.Meta.fields):
+    # the same checks FoodForm.is_valid runs, without building a bound form
+    # and a model instance per row. Neither FoodForm nor FavouriteFood has
+    # clean hooks or unique fields, so each field's form and model clean
+    # cover everything is_valid and _post_clean validate
+    checks = [
+        (name, FoodForm.base_fields[name], FavouriteFood._meta.get_field(name))
+        for name in fields
+    ]
+    results = []
+
+    for row in rows:
+        cleaned_data = {}
+        errors = {}
+
+        for name, form_field, model_field in checks:
+            try:
+                value = form_field.clean(row.get(name))
+                cleaned_data[name] = model_field.clean(value, None)
+
+            except ValidationError as error:
+                errors[name] = error.messages
+
+        results.append((cleaned_data, errors))
+
+    return results
@@ -1,5 +1,30 @@
-from django.http import HttpResponse
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
 from .forms import FoodForm
+from .models import FavouriteFood
+from .instrumentation import span
+from .metrics import registry
+from .photos import schedule_photo_processing
+from .summaries import update_form_summaries
+
+HISTORY_ROWS_MARKER = "<!-- history-rows -->"
+
+PENDING_FORM_CACHE_KEY = "pending_form:{user_id}:{form_id}"
+
+COMPLETION_ERRORS = {
+    "not_found": ("No assigned form was found!", 400),
+    "already_completed": ("This form has already been compeleted!", 400),
+    "unauthorized": ("Unauthorized!", 401),
+}
 
 
 def generate_forms_to_complete(assigned_food_forms, user):
@@ -18,9 +43,236 @@ def generate_forms_to_complete(assigned_food_forms, user):
     return forms_to_complete
 
 
+def render_forms_to_complete(assigned_food_forms, user):
+    assigned_food_forms = list(assigned_food_forms)
+
+    # the fragment embeds the user's name and email, so a profile change
+    # must not serve a stale form
+    fingerprint = hashlib.md5(
+        "{} {}\n{}".format(user.first_name, user.last_name, user.email).encode()
+    ).hexdigest()
+
+    keys = {
+        form.pk: PENDING_FORM_CACHE_KEY.format(user_id=user.pk, form_id=form.pk)
+        for form in assigned_food_forms
+    }
+    cached = cache.get_many(keys.values())
+
+    fragments = {}
+    missing = []
+
+    for form in assigned_food_forms:
+        entry = cached.get(keys[form.pk])
+
+        if entry and entry[0] == fingerprint:
+            fragments[form.pk] = entry[1]
+
+        else:
+            missing.append(form)
+
+    rendered = {}
+
+    for form in generate_forms_to_complete(missing, user):
+        form_id = form.initial["assigned_form_id"]
+        fragments[form_id] = form.as_p()
+        rendered[keys[form_id]] = (fingerprint, fragments[form_id])
+
+    if rendered:
+        cache.set_many(rendered, timeout=settings.PENDING_FORM_CACHE_TIMEOUT)
+
+    return [
+        {"id": form.pk, "html": mark_safe(fragments[form.pk])}
+        for form in assigned_food_forms
+    ]
+
+
+def invalidate_pending_forms(user_id, form_ids):
+    cache.delete_many(
+        [
+            PENDING_FORM_CACHE_KEY.format(user_id=user_id, form_id=form_id)
+            for form_id in form_ids
+        ]
+    )
+
+
 def update_food_record(submitted_form, record_id, user):
     food = submitted_form.save(commit=False)
-    food.id = record_id
-    food.completed = True
-    food.user_id = user
-    food.save()
+    food.completed_at = timezone.now()
+
+    photo_name = None
+
+    # the photo's name is known from its content before it is stored, so the
+    # row is claimed by a single statement and the file is only written once
+    # the claim succeeds; a failed write rolls the claim back
+    if food.photo:
+        photo_name = food.photo.storage.content_name(
+            food.photo.field.generate_filename(food, food.photo.name), food.photo
+        )
+
+    with transaction.atomic():
+        updated = FavouriteFood.objects.filter(
+            pk=record_id, user_id=user.pk, completed=False
+        ).update(
+            name=food.name,
+            email=food.email,
+            telephone=food.telephone,
+            photo=photo_name,
+            dob=food.dob,
+            food=food.food,
+            completed=True,
+            completed_at=food.completed_at,
+        )
+
+        if updated:
+            if food.photo:
+                with span("file"):
+                    food.photo.save(food.photo.name, food.photo.file, save=False)
+
+            update_form_summaries(
+                [user.pk], completed=1, completed_at=food.completed_at
+            )
+
+    if updated and food.photo:
+        schedule_photo_processing(record_id)
+
+    return updated
+
+
+def completion_failure(record_id, user):
+    food = FavouriteFood.objects.filter(pk=record_id).values("user_id", "completed")
+    food = food.first()
+
+    if not food:
+        return "not_found"
+
+    if food["completed"]:
+        return "already_completed"
+
+    if food["user_id"] != user.pk:
+        return "unauthorized"
+
+    return "not_found"
+
+
+def complete_assignment(submitted_form, record_id, user):
+    if not update_food_record(
+        submitted_form=submitted_form, user=user, record_id=record_id
+    ):
+        return completion_failure(record_id, user)
+
+    invalidate_pending_forms(user.pk, [record_id])
+    registry.inc("app_forms_completed_total")
+    registry.inc("app_upload_bytes_total", submitted_form.cleaned_data["photo"].size)
+
+    return "completed"
+
+
+def bulk_assign_forms(user_ids=None, unassigned_only=False, batch_size=500):
+    users = User.objects.filter(is_superuser=False)
+    batches = [users]
+
+    if user_ids is not None:
+        # in batches, so no query has more parameters than the backend allows
+        user_ids = sorted(set(user_ids))
+        batches = [
+            users.filter(pk__in=user_ids[start : start + batch_size])
+            for start in range(0, len(user_ids), batch_size)
+        ]
+
+    assignees = []
+    requested = 0
+
+    for batch in batches:
+        candidates = batch.annotate(
+            open_forms=Count("favouritefood", filter=Q(favouritefood__completed=False))
+        ).values_list("pk", "open_forms")
+
+        for pk, open_forms in candidates:
+            requested += 1
+
+            if not (unassigned_only and open_forms):
+                assignees.append(pk)
+
+    if user_ids is not None:
+        requested = len(user_ids)
+
+    with transaction.atomic():
+        FavouriteFood.objects.bulk_create(
+            (FavouriteFood(user_id=pk) for pk in assignees), batch_size=batch_size
+        )
+        update_form_summaries(assignees, opened=1, batch_size=batch_size)
+
+    return len(assignees), requested - len(assignees)
+
+
+def search_users(prefix=""):
+    users = User.objects.filter(is_superuser=False).select_related("form_summary")
+
+    if prefix:
+        # a range rather than LIKE so the username and email indexes apply
+        upper = prefix + "\U0010ffff"
+        users = users.filter(
+            Q(username__gte=prefix, username__lt=upper)
+            | Q(email__gte=prefix, email__lt=upper)
+        )
+
+    return users.order_by("id")
+
+
+def get_history_queryset(user):
+    if user.is_superuser:
+        foods = FavouriteFood.objects.filter(completed=True)
+
+    else:
+        foods = FavouriteFood.objects.for_user(user, completed=True)
+
+    return foods.order_by("id")
+
+
+def parse_cursor(value):
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        return None
+
+    return cursor if cursor > 0 else None
+
+
+def paginate_by_cursor(queryset, page_size):
+    # one extra row tells us whether there is a next page without a COUNT
+    page = list(queryset[: page_size + 1])
+    next_cursor = page[page_size - 1].pk if len(page) > page_size else None
+
+    return page[:page_size], next_cursor
+
+
+def stream_history(request, queryset, chunk_size):
+    page = render_to_string("history.html", {"streaming": True}, request=request)
+    head, tail = page.split(HISTORY_ROWS_MARKER, 1)
+    # the rows are read after the view returns, so the database is fixed now
+    queryset = queryset.using(queryset.db)
+
+    def rows():
+        yield head
+
+        chunk = []
+        start = 0
+
+        for food in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(food)
+
+            if len(chunk) == chunk_size:
+                yield render_history_rows(chunk, start)
+                start += len(chunk)
+                chunk = []
+
+        if chunk:
+            yield render_history_rows(chunk, start)
+
+        yield tail
+
+    return StreamingHttpResponse(rows(), content_type="text/html; charset=utf-8")
+
+
+def render_history_rows(foods, start):
+    return render_to_string("history_rows.html", {"foods": foods, "start": start})
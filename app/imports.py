@@ -0,0 +1,231 @@
+import csv
+import json
+import os
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.db import transaction
+from django.forms import ValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .forms import validate_food_rows
+from .models import FavouriteFood
+from .photos import schedule_photo_processing
+from .summaries import update_form_summaries
+from .validations import image_validator
+
+IMPORT_FIELDS = ("name", "email", "telephone", "dob", "food")
+
+
+class MalformedRecord:
+    # a line that couldn't be read as a record, rejected like an invalid one
+    def __init__(self, message):
+        self.errors = {"__all__": [message]}
+
+
+class Lines:
+    # decoded lines of a binary file, tracking the offset just past the last
+    # one read so an import can resume by seeking rather than re-reading
+    def __init__(self, source, offset):
+        source.seek(offset)
+        self.source = source
+        self.offset = offset
+
+    def __iter__(self):
+        for line in self.source:
+            self.offset += len(line)
+            yield line.decode("utf-8")
+
+
+def parse_json_line(line):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return MalformedRecord("Line is not valid JSON.")
+
+    if not isinstance(record, dict):
+        return MalformedRecord("Line is not a JSON object.")
+
+    return record
+
+
+def read_records(path, format=None, offset=0):
+    # yields (record, offset after it) pairs, starting at a saved offset
+    format = format or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+
+    with open(path, "rb") as source:
+        if format == "csv":
+            lines = Lines(source, 0)
+            reader = csv.reader(iter(lines))
+            header = next(reader, None)
+
+            if header is None:
+                return
+
+            if offset > lines.offset:
+                lines = Lines(source, offset)
+                reader = csv.reader(iter(lines))
+
+            for row in reader:
+                if row:
+                    yield dict(zip(header, row)), lines.offset
+
+        else:
+            source.seek(offset)
+
+            # blank lines, a trailing newline included, are skipped like
+            # empty CSV rows
+            for line in source:
+                offset += len(line)
+
+                if line.strip():
+                    yield parse_json_line(line), offset
+
+
+def chunked(records, size):
+    records = iter(records)
+
+    while True:
+        chunk = list(islice(records, size))
+
+        if not chunk:
+            return
+
+        yield chunk
+
+
+def parse_completed_at(value, default):
+    if not value:
+        return default
+
+    completed_at = parse_datetime(value)
+
+    if completed_at is None:
+        raise ValidationError("Enter a valid date/time.")
+
+    if timezone.is_naive(completed_at):
+        completed_at = timezone.make_aware(completed_at)
+
+    return completed_at
+
+
+def check_photo(path, photo_root):
+    image_validator(File(None, name=path))
+    path = os.path.join(photo_root, path)
+
+    if not os.path.isfile(path):
+        raise ValidationError("Photo file not found.")
+
+    return path
+
+
+def store_photo(path):
+    field = FavouriteFood._meta.get_field("photo")
+    name = field.generate_filename(None, os.path.basename(path))
+
+    with open(path, "rb") as photo:
+        return field.storage.save(name, File(photo))
+
+
+def import_chunk(records, photo_root, now=None, checkpoint=None):
+    # checkpoint(imported, rejected) runs in the chunk's transaction, so the
+    # progress it saves commits or rolls back with the rows
+    now = now or timezone.now()
+    rejected = []
+    rows = []
+
+    for offset, record in enumerate(records):
+        if isinstance(record, MalformedRecord):
+            rejected.append((offset, record.errors))
+        else:
+            rows.append((offset, record))
+
+    results = validate_food_rows([record for _, record in rows], fields=IMPORT_FIELDS)
+
+    usernames = {record.get("username") for _, record in rows}
+    users = dict(
+        User.objects.filter(username__in=usernames).values_list("username", "pk")
+    )
+
+    foods = []
+
+    for (offset, record), (cleaned_data, errors) in zip(rows, results):
+        user_id = users.get(record.get("username"))
+        photo = None
+
+        if user_id is None:
+            errors["username"] = ["No user with this username."]
+
+        try:
+            completed_at = parse_completed_at(record.get("completed_at"), now)
+        except ValidationError as error:
+            errors["completed_at"] = error.messages
+
+        if record.get("photo"):
+            try:
+                photo = check_photo(record["photo"], photo_root)
+            except ValidationError as error:
+                errors["photo"] = error.messages
+
+        if errors:
+            rejected.append((offset, errors))
+            continue
+
+        foods.append(
+            (
+                FavouriteFood(
+                    user_id=user_id,
+                    completed=True,
+                    completed_at=completed_at,
+                    **cleaned_data
+                ),
+                photo,
+            )
+        )
+
+    # photos go into storage before the transaction so it only holds the
+    # inserts; storage is content-addressed, so a retried chunk reuses them
+    for food, photo in foods:
+        if photo:
+            food.photo = store_photo(photo)
+
+    # users with the same number of new forms and latest completion share an
+    # UPDATE, rather than every chunk recounting all of its users' rows
+    changes = {}
+
+    for food, photo in foods:
+        count, latest = changes.get(food.user_id, (0, food.completed_at))
+        changes[food.user_id] = (count + 1, max(latest, food.completed_at))
+
+    groups = {}
+
+    for user_id, change in changes.items():
+        groups.setdefault(change, []).append(user_id)
+
+    rejected.sort(key=lambda rejection: rejection[0])
+    photos = [food.photo for food, photo in foods if photo]
+
+    with transaction.atomic():
+        FavouriteFood.objects.bulk_create(
+            [food for food, photo in foods], batch_size=len(records)
+        )
+
+        for (count, latest), user_ids in groups.items():
+            update_form_summaries(
+                user_ids, opened=count, completed=count, completed_at=latest
+            )
+
+        # bulk_create doesn't return ids here, but every imported photo is
+        # one without a thumbnail yet
+        if photos:
+            pending = FavouriteFood.objects.filter(photo__in=photos, thumbnail="")
+
+            for food_id in pending.values_list("pk", flat=True):
+                schedule_photo_processing(food_id)
+
+        if checkpoint:
+            checkpoint(len(foods), rejected)
+
+    return len(foods), rejected
@@ -0,0 +1,170 @@
+import cProfile
+import json
+import logging
+import os
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("instrumentation_spans", default=None)
+
+
+class Spans:
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+
+        finally:
+            self.add("db", time.perf_counter() - start)
+
+    def server_timing(self):
+        return ", ".join(
+            '{};dur={:.1f};desc="{}x"'.format(name, duration * 1000, self.counts[name])
+            for name, duration in self.durations.items()
+        )
+
+    def as_dict(self):
+        return {
+            name: {"ms": round(duration * 1000, 3), "count": self.counts[name]}
+            for name, duration in self.durations.items()
+        }
+
+
+@contextmanager
+def span(name):
+    spans = _current.get()
+
+    if spans is None:
+        yield
+        return
+
+    start = time.perf_counter()
+
+    try:
+        yield
+
+    finally:
+        spans.add(name, time.perf_counter() - start)
+
+
+@contextmanager
+def instrument_connections():
+    # execute wrappers are per connection, and connections are per thread, so
+    # this is entered again by the threads async views run sync code in
+    spans = _current.get()
+
+    with ExitStack() as stack:
+        if spans is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(spans))
+
+        yield
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        spans = Spans()
+        token = _current.set(spans)
+        profiler = None
+
+        if random.random() < settings.INSTRUMENTATION_PROFILE_RATE:
+            profiler = cProfile.Profile()
+
+        try:
+            with instrument_connections():
+                if profiler:
+                    profiler.enable()
+
+                try:
+                    with span("view"):
+                        response = self.get_response(request)
+
+                finally:
+                    if profiler:
+                        profiler.disable()
+
+        finally:
+            _current.reset(token)
+
+        return self.report(request, response, spans, profiler)
+
+    async def __acall__(self, request):
+        # cProfile only sees its own thread, which here is the event loop every
+        # request shares, so async requests are timed but never profiled
+        spans = Spans()
+        token = _current.set(spans)
+
+        try:
+            with span("view"):
+                response = await self.get_response(request)
+
+        finally:
+            _current.reset(token)
+
+        return self.report(request, response, spans, None)
+
+    def report(self, request, response, spans, profiler):
+        total_ms = spans.durations["view"] * 1000
+        response["Server-Timing"] = spans.server_timing()
+
+        logger.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "total_ms": round(total_ms, 3),
+                    "spans": spans.as_dict(),
+                }
+            )
+        )
+
+        if profiler and total_ms >= settings.INSTRUMENTATION_SLOW_MS:
+            self.dump_profile(profiler, request, total_ms)
+
+        return response
+
+    def dump_profile(self, profiler, request, total_ms):
+        os.makedirs(settings.INSTRUMENTATION_PROFILE_DIR, exist_ok=True)
+
+        file_name = "{}-{}-{:.0f}ms.prof".format(
+            time.strftime("%Y%m%dT%H%M%S"),
+            request.path.strip("/").replace("/", "_") or "index",
+            total_ms,
+        )
+        profiler.dump_stats(
+            os.path.join(settings.INSTRUMENTATION_PROFILE_DIR, file_name)
+        )
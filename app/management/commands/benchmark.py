@@ -0,0 +1,100 @@
+import json
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from ... import benchmarks
+from ...photos import shutdown_executor
+
+
+def parse_sizes(value):
+    try:
+        sizes = [
+            tuple(int(part) for part in size.split(":")) for size in value.split(",")
+        ]
+    except ValueError:
+        sizes = None
+
+    if not sizes or any(len(size) != 2 for size in sizes):
+        raise CommandError("sizes must look like 100:1000,1000:10000 (users:rows)")
+
+    return sizes
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database and measure latency, queries and peak memory "
+        "of the core request flows, reported as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="100:1000,1000:10000",
+            help="Comma separated users:rows data sizes to seed.",
+        )
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument(
+            "--flows",
+            default=",".join(benchmarks.FLOWS),
+            help="Comma separated flows to measure.",
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+        parser.add_argument(
+            "--compare", help="Previous JSON report to compare the results with."
+        )
+        parser.add_argument(
+            "--validation",
+            action="store_true",
+            help="Only run the form validation micro-benchmarks.",
+        )
+
+    def handle(self, *args, **options):
+        if options["validation"]:
+            self.write(options, {"validation": benchmarks.measure_validation()})
+            return
+
+        sizes = parse_sizes(options["sizes"])
+        flows = options["flows"].split(",")
+        unknown = set(flows) - set(benchmarks.FLOWS)
+
+        if unknown:
+            raise CommandError("unknown flows: {}".format(", ".join(sorted(unknown))))
+
+        media_root = tempfile.mkdtemp()
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                report = benchmarks.run(sizes, options["iterations"], flows=flows)
+                # let queued thumbnails finish before their files go away
+                shutdown_executor()
+
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media_root)
+
+        if options["compare"]:
+            with open(options["compare"]) as baseline:
+                report["comparison"] = list(
+                    benchmarks.compare(json.load(baseline), report)
+                )
+
+        self.write(options, report)
+
+    def write(self, options, report):
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                output.write(benchmarks.dumps(report))
+
+        else:
+            self.stdout.write(benchmarks.dumps(report))
@@ -0,0 +1,74 @@
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from ...models import FavouriteFood
+from ...storage import content_addressed_name, file_digest
+
+
+class Command(BaseCommand):
+    help = "Move uploaded photos into content addressed storage, one file per image."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would change without touching files or rows.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        scanned = unique = freed = 0
+
+        for field_name in ("photo", "thumbnail"):
+            field = FavouriteFood._meta.get_field(field_name)
+            storage = field.storage
+            directory = field.upload_to
+            renames = {}
+            targets = set()
+
+            if not storage.exists(directory):
+                continue
+
+            for file_name in storage.listdir(directory)[1]:
+                name = os.path.join(directory, file_name)
+
+                with storage.open(name, "rb") as file:
+                    digest = file_digest(File(file))
+
+                extension = os.path.splitext(file_name)[1]
+                target = content_addressed_name(directory, digest, extension)
+
+                if target == name:
+                    continue
+
+                scanned += 1
+
+                if target in targets or storage.exists(target):
+                    freed += storage.size(name)
+
+                else:
+                    unique += 1
+
+                renames[name] = target
+                targets.add(target)
+
+            if dry_run:
+                continue
+
+            for name, target in renames.items():
+                if not storage.exists(target):
+                    os.makedirs(os.path.dirname(storage.path(target)), exist_ok=True)
+                    os.link(storage.path(name), storage.path(target))
+
+                FavouriteFood.objects.filter(**{field_name: name}).update(
+                    **{field_name: target}
+                )
+                storage.delete(name)
+
+        self.stdout.write(
+            "{}{} files deduplicated into {} unique files, {} bytes freed.".format(
+                "[dry run] " if dry_run else "", scanned, unique, freed
+            )
+        )
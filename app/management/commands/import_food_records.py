@@ -0,0 +1,99 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...imports import chunked, import_chunk, read_records
+from ...models import ImportCheckpoint
+
+
+class Command(BaseCommand):
+    help = (
+        "Import completed favourite food records from a CSV or JSONL file with "
+        "username, name, email, telephone, dob, food and optional photo and "
+        "completed_at columns. Progress is checkpointed with every chunk, so "
+        "an interrupted import resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=("csv", "jsonl"))
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--photo-root",
+            help="Directory photo paths are relative to, the file's by default.",
+        )
+        parser.add_argument(
+            "--checkpoint", help="Checkpoint name, the file's full path by default."
+        )
+        parser.add_argument(
+            "--errors", help="Write rejected rows and their errors to this JSONL file."
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the checkpoint and import from the first row.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+
+        if not os.path.isfile(path):
+            raise CommandError("{} does not exist".format(path))
+
+        if options["chunk_size"] < 1:
+            raise CommandError("chunk size must be positive")
+
+        photo_root = options["photo_root"] or os.path.dirname(os.path.abspath(path))
+        name = options["checkpoint"] or os.path.abspath(path)
+
+        if options["restart"]:
+            ImportCheckpoint.objects.filter(name=name).delete()
+
+        progress = ImportCheckpoint.objects.filter(name=name).first()
+        progress = progress or ImportCheckpoint(name=name)
+        records = read_records(path, options["format"], progress.offset)
+        errors = open(options["errors"], "a") if options["errors"] else None
+
+        try:
+            for chunk in chunked(records, options["chunk_size"]):
+
+                def checkpoint(imported, rejected):
+                    if errors:
+                        write_errors(errors, progress.rows, rejected)
+
+                    progress.rows += len(chunk)
+                    progress.offset = chunk[-1][1]
+                    progress.imported += imported
+                    progress.rejected += len(rejected)
+                    progress.save()
+
+                import_chunk(
+                    [record for record, offset in chunk],
+                    photo_root,
+                    checkpoint=checkpoint,
+                )
+
+                if options["verbosity"] > 1:
+                    self.stdout.write("{} rows read.".format(progress.rows))
+
+        finally:
+            if errors:
+                errors.close()
+
+        self.stdout.write(
+            "{} records imported, {} rows rejected.".format(
+                progress.imported, progress.rejected
+            )
+        )
+
+
+def write_errors(errors, rows, rejected):
+    # written before the chunk commits, so a crash can repeat a chunk's
+    # errors but never lose them
+    for offset, row_errors in rejected:
+        errors.write(
+            json.dumps({"row": rows + offset + 1, "errors": row_errors}) + "\n"
+        )
+
+    errors.flush()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from ...summaries import rebuild_form_summaries
+
+
+class Command(BaseCommand):
+    help = "Recount every user's open and completed food forms."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "user_ids", nargs="*", type=int, help="Only rebuild these users."
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_form_summaries(
+            user_ids=options["user_ids"] or None, batch_size=options["batch_size"]
+        )
+
+        self.stdout.write("{} form summaries rebuilt.".format(rebuilt))
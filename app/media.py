@@ -0,0 +1,139 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils.http import http_date, parse_etags
+from django.views.static import was_modified_since
+
+from .storage import name_digest
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+CHUNK_SIZE = 64 * 1024
+
+
+def serve_media(request, file):
+    path = file.storage.path(file.name)
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return HttpResponse("Photo not found", status=404)
+
+    # a content-addressed name already is a hash of the bytes, so it stays the
+    # same across copies and restores that change the file's mtime
+    digest = name_digest(file.name)
+    etag = '"{}"'.format(digest or "{:x}-{:x}".format(stat.st_mtime_ns, stat.st_size))
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(stat.st_mtime),
+        "Cache-Control": "private, max-age={}".format(settings.MEDIA_CACHE_MAX_AGE),
+    }
+
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+
+    if if_none_match:
+        etags = [
+            tag[2:] if tag.startswith("W/") else tag
+            for tag in parse_etags(if_none_match)
+        ]
+        not_modified = etag in etags or "*" in etags
+
+    else:
+        not_modified = not was_modified_since(
+            request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime, stat.st_size
+        )
+
+    if not_modified:
+        return with_headers(HttpResponseNotModified(), headers)
+
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    if settings.MEDIA_SENDFILE == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = path
+        return with_headers(response, headers)
+
+    if settings.MEDIA_SENDFILE == "x-accel-redirect":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + file.name
+        return with_headers(response, headers)
+
+    headers["Accept-Ranges"] = "bytes"
+    byte_range = request.META.get("HTTP_RANGE")
+
+    if byte_range and request.META.get("HTTP_IF_RANGE", etag) == etag:
+        byte_range = parse_range(byte_range, stat.st_size)
+
+        if byte_range:
+            return serve_range(path, byte_range, stat.st_size, content_type, headers)
+
+    response = FileResponse(open(path, "rb"), content_type=content_type)
+    return with_headers(response, headers)
+
+
+def parse_range(byte_range, size):
+    # multiple, malformed or inverted ranges are ignored and the whole file
+    # is served, as RFC 7233 allows
+    match = RANGE_RE.match(byte_range.strip())
+
+    if not match or not any(match.groups()):
+        return None
+
+    start, end = match.groups()
+
+    if start and end and int(start) > int(end):
+        return None
+
+    if start:
+        return int(start), min(int(end), size - 1) if end else size - 1
+
+    # a suffix range such as "bytes=-500" asks for the last 500 bytes
+    return max(size - int(end), 0), size - 1
+
+
+def serve_range(path, byte_range, size, content_type, headers):
+    start, end = byte_range
+
+    if start >= size:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = "bytes */{}".format(size)
+        return with_headers(response, headers)
+
+    response = StreamingHttpResponse(
+        read_range(path, start, end - start + 1),
+        status=206,
+        content_type=content_type,
+    )
+    response["Content-Range"] = "bytes {}-{}/{}".format(start, end, size)
+    response["Content-Length"] = str(end - start + 1)
+
+    return with_headers(response, headers)
+
+
+def read_range(path, start, length):
+    with open(path, "rb") as file:
+        file.seek(start)
+
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+
+            if not chunk:
+                break
+
+            length -= len(chunk)
+            yield chunk
+
+
+def with_headers(response, headers):
+    for header, value in headers.items():
+        response[header] = value
+
+    return response
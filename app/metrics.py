@@ -0,0 +1,339 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS = {
+    "app_requests_total": ("counter", "Requests handled, by view and status code."),
+    "app_request_duration_seconds": ("histogram", "Request latency, by view."),
+    "app_forms_assigned_total": ("counter", "Food forms assigned to users."),
+    "app_forms_completed_total": ("counter", "Food forms completed by users."),
+    "app_upload_bytes_total": ("counter", "Bytes of photos uploaded."),
+    "app_forms_open": ("gauge", "Food forms assigned and not completed yet."),
+    "app_forms_completed": ("gauge", "Food forms completed."),
+}
+
+_USED = struct.Struct("<Q")
+_KEY_LENGTH = struct.Struct("<I")
+_VALUE = struct.Struct("<d")
+
+INITIAL_FILE_SIZE = 64 * 1024
+
+
+def _padded(length):
+    return length + (-length % 8)
+
+
+def read_values(data, used):
+    position = _USED.size
+
+    while position < used:
+        (length,) = _KEY_LENGTH.unpack_from(data, position)
+        key = bytes(data[position + 4 : position + 4 + length]).decode("utf-8")
+        position += _padded(_KEY_LENGTH.size + length)
+        (value,) = _VALUE.unpack_from(data, position)
+        yield key, value, position
+        position += _VALUE.size
+
+
+def read_file(path):
+    with open(path, "rb") as file:
+        data = file.read()
+
+    if len(data) < _USED.size:
+        return {}
+
+    (used,) = _USED.unpack_from(data, 0)
+
+    return {key: value for key, value, _ in read_values(data, min(used, len(data)))}
+
+
+class MmapValues:
+    # An append only file of (key, float) entries owned by a single process.
+    # Other processes only ever read it, so workers never contend on a lock.
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = open(path, "a+b")
+        size = os.fstat(self._file.fileno()).st_size
+
+        if size == 0:
+            size = INITIAL_FILE_SIZE
+            self._file.truncate(size)
+
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        (self._used,) = _USED.unpack_from(self._mmap, 0)
+
+        if not self._used:
+            self._used = _USED.size
+            _USED.pack_into(self._mmap, 0, self._used)
+
+        self._offsets = {
+            key: offset for key, _, offset in read_values(self._mmap, self._used)
+        }
+
+    def add(self, key, amount):
+        with self._lock:
+            offset = self._offsets.get(key)
+
+            if offset is None:
+                offset = self._append(key)
+
+            (value,) = _VALUE.unpack_from(self._mmap, offset)
+            _VALUE.pack_into(self._mmap, offset, value + amount)
+
+    def _append(self, key):
+        encoded = key.encode("utf-8")
+        offset = self._used + _padded(_KEY_LENGTH.size + len(encoded))
+        used = offset + _VALUE.size
+
+        if used > len(self._mmap):
+            size = len(self._mmap)
+
+            while used > size:
+                size *= 2
+
+            self._mmap.close()
+            self._file.truncate(size)
+            self._mmap = mmap.mmap(self._file.fileno(), size)
+
+        _KEY_LENGTH.pack_into(self._mmap, self._used, len(encoded))
+        start = self._used + _KEY_LENGTH.size
+        self._mmap[start : start + len(encoded)] = encoded
+        _VALUE.pack_into(self._mmap, offset, 0.0)
+
+        # readers trust the used marker, so it moves only once the entry is
+        # complete
+        self._used = used
+        _USED.pack_into(self._mmap, 0, used)
+        self._offsets[key] = offset
+
+        return offset
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # running, as another user
+        pass
+
+    return True
+
+
+def merge_dead_workers(directory, values):
+    # the totals of workers that have exited move into a new worker's file, so
+    # counters don't drop and the directory holds a file per live worker only
+    for file_name in os.listdir(directory):
+        pid = file_name[: -len(".db")]
+
+        if not file_name.endswith(".db") or not pid.isdigit():
+            continue
+
+        if int(pid) == os.getpid() or pid_alive(int(pid)):
+            continue
+
+        # renamed first so that of two workers starting together only one
+        # merges it
+        path = os.path.join(directory, file_name)
+        claimed = "{}.{}".format(path, os.getpid())
+
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            continue
+
+        for key, value in read_file(claimed).items():
+            values.add(key, value)
+
+        os.remove(claimed)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._values = None
+        self._owner = None
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def _store(self):
+        owner = (os.getpid(), settings.METRICS_DIR)
+
+        if owner == self._owner:
+            return self._values
+
+        # a forked worker or a new METRICS_DIR gets a file of its own; two
+        # mappings of one file would append over each other's entries
+        with self._lock:
+            if owner != self._owner:
+                os.makedirs(owner[1], exist_ok=True)
+                values = MmapValues(os.path.join(owner[1], "{}.db".format(owner[0])))
+                merge_dead_workers(owner[1], values)
+                self._values = values
+                self._owner = owner
+
+        return self._values
+
+    def _key(self, name, labels):
+        cache_key = (name, labels)
+        key = self._keys.get(cache_key)
+
+        if key is None:
+            key = self._keys[cache_key] = json.dumps([name, labels])
+
+        return key
+
+    def inc(self, name, amount=1, labels=()):
+        if settings.METRICS_ENABLED:
+            self._store().add(self._key(name, labels), amount)
+
+    def observe(self, name, value, labels=()):
+        if not settings.METRICS_ENABLED:
+            return
+
+        store = self._store()
+        index = bisect.bisect_left(HISTOGRAM_BUCKETS, value)
+        bound = HISTOGRAM_BUCKETS[index] if index < len(HISTOGRAM_BUCKETS) else "+Inf"
+
+        store.add(self._key(name + "_bucket", labels + (("le", str(bound)),)), 1)
+        store.add(self._key(name + "_sum", labels), value)
+        store.add(self._key(name + "_count", labels), 1)
+
+    def collect(self):
+        totals = {}
+
+        if not os.path.isdir(settings.METRICS_DIR):
+            return totals
+
+        for file_name in os.listdir(settings.METRICS_DIR):
+            if not file_name.endswith(".db"):
+                continue
+
+            values = read_file(os.path.join(settings.METRICS_DIR, file_name))
+
+            for key, value in values.items():
+                name, labels = json.loads(key)
+                sample = (name, tuple(tuple(label) for label in labels))
+                totals[sample] = totals.get(sample, 0.0) + value
+
+        return totals
+
+
+registry = MetricsRegistry()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+
+    return "{{{}}}".format(
+        ",".join(
+            '{}="{}"'.format(
+                name,
+                value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+            )
+            for name, value in labels
+        )
+    )
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render_metrics(gauges):
+    samples = registry.collect()
+
+    for name, value in gauges.items():
+        samples[(name, ())] = value
+
+    lines = []
+
+    for metric, (kind, help_text) in METRICS.items():
+        lines.append("# HELP {} {}".format(metric, help_text))
+        lines.append("# TYPE {} {}".format(metric, kind))
+
+        if kind != "histogram":
+            for (name, labels), value in sorted(samples.items()):
+                if name == metric:
+                    lines.append(
+                        "{}{} {}".format(
+                            name, _format_labels(labels), _format_value(value)
+                        )
+                    )
+            continue
+
+        series = sorted(labels for name, labels in samples if name == metric + "_count")
+
+        for labels in series:
+            cumulative = 0
+
+            for bound in HISTOGRAM_BUCKETS + ("+Inf",):
+                bucket_labels = labels + (("le", str(bound)),)
+                cumulative += samples.get((metric + "_bucket", bucket_labels), 0)
+                lines.append(
+                    "{}_bucket{} {}".format(
+                        metric, _format_labels(bucket_labels), _format_value(cumulative)
+                    )
+                )
+
+            for suffix in ("_sum", "_count"):
+                lines.append(
+                    "{}{}{} {}".format(
+                        metric,
+                        suffix,
+                        _format_labels(labels),
+                        _format_value(samples[(metric + suffix, labels)]),
+                    )
+                )
+
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        # under ASGI a sync-only middleware would run the whole chain in
+        # threads, serialising every request in the worker
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start)
+
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start)
+
+        return response
+
+    def record(self, request, response, duration):
+        match = request.resolver_match
+        view = (("view", (match.url_name or "unnamed") if match else "unmatched"),)
+
+        registry.inc(
+            "app_requests_total", labels=view + (("status", str(response.status_code)),)
+        )
+        registry.observe("app_request_duration_seconds", duration, labels=view)
@@ -0,0 +1,21 @@
+# Generated by Django 3.0.14 on 2026-10-18 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favouritefood',
+            index=models.Index(fields=['user', 'completed'], name='food_user_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favouritefood',
+            index=models.Index(condition=models.Q(completed=True), fields=['id'], name='food_completed_id_idx'),
+        ),
+    ]
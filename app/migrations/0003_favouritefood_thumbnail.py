@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-18 11:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_favouritefood_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favouritefood',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='uploads/thumbnails/'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.0.14 on 2026-10-18 11:56
+
+import app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_favouritefood_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='favouritefood',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=app.storage.ContentAddressedStorage(), upload_to='uploads/'),
+        ),
+        migrations.AlterField(
+            model_name='favouritefood',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, storage=app.storage.ContentAddressedStorage(), upload_to='uploads/thumbnails/'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.0.14 on 2026-10-18 12:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_summaries(apps, schema_editor):
+    User = apps.get_model("auth", "User")
+    FormSummary = apps.get_model("app", "FormSummary")
+
+    users = User.objects.annotate(
+        open_count=models.Count("favouritefood", filter=models.Q(favouritefood__completed=False)),
+        completed_count=models.Count("favouritefood", filter=models.Q(favouritefood__completed=True)),
+    ).values_list("pk", "open_count", "completed_count")
+
+    FormSummary.objects.bulk_create(
+        (
+            FormSummary(user_id=pk, open_count=open_count, completed_count=completed_count)
+            for pk, open_count, completed_count in users.iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('app', '0004_favouritefood_photo_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='form_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('open_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('last_completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='favouritefood',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+EMAIL_INDEX = models.Index(fields=['email'], name='app_auth_user_email_idx')
+
+
+def add_email_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('auth', 'User'), EMAIL_INDEX)
+
+
+def remove_email_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('auth', 'User'), EMAIL_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    # after auth's own migrations, since SQLite remakes auth_user for those and
+    # only keeps the indexes auth knows about
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('app', '0005_form_summary'),
+    ]
+
+    # auth.User has no index on email, which the users list prefix search needs
+    operations = [
+        migrations.RunPython(add_email_index, remove_email_index),
+    ]
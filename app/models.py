@@ -1,16 +1,74 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from .storage import photo_storage
+
+
+class FavouriteFoodQuerySet(models.QuerySet):
+    def for_user(self, user, completed):
+        # a plain completed=False renders as "NOT completed", which SQLite
+        # can't look up in food_user_completed_idx; "completed = 0" can
+        return self.filter(user=user, completed__exact=models.Value(completed))
+
 
 class FavouriteFood(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=30, blank=True, null=True)
     email = models.EmailField(max_length=100, blank=True, null=True)
     telephone = models.CharField(max_length=20, blank=True, null=True)
-    photo = models.ImageField(upload_to="uploads/", blank=True, null=True)
+    photo = models.ImageField(
+        upload_to="uploads/", storage=photo_storage, blank=True, null=True
+    )
+    thumbnail = models.ImageField(
+        upload_to="uploads/thumbnails/",
+        storage=photo_storage,
+        blank=True,
+        null=True,
+        editable=False,
+    )
     dob = models.DateField(blank=True, null=True)
     food = models.CharField(max_length=100, blank=True, null=True)
     completed = models.BooleanField(default=False)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    objects = FavouriteFoodQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "completed"], name="food_user_completed_idx"
+            ),
+            models.Index(
+                fields=["id"],
+                name="food_completed_id_idx",
+                condition=models.Q(completed=True),
+            ),
+        ]
 
     def __str__(self):
         return "%s" % (self.id,)
+
+
+class FormSummary(models.Model):
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="form_summary"
+    )
+    open_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    last_completed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return "%s" % (self.user_id,)
+
+
+class ImportCheckpoint(models.Model):
+    # how far an import_food_records run has got, saved in the transaction of
+    # the chunk it covers so a resumed import neither repeats nor skips one
+    name = models.CharField(max_length=255, primary_key=True)
+    rows = models.PositiveIntegerField(default=0)
+    offset = models.PositiveBigIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return "%s" % (self.name,)
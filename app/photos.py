@@ -0,0 +1,97 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from PIL import Image
+
+from .models import FavouriteFood
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PHOTO_PROCESSING_WORKERS,
+            thread_name_prefix="photo-processing",
+        )
+
+    return _executor
+
+
+def shutdown_executor(wait=True):
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        _executor = None
+
+
+def schedule_photo_processing(food_id):
+    # the row and the uploaded file are only visible to the worker's own
+    # connection once the request's transaction has committed
+    transaction.on_commit(lambda: get_executor().submit(_run_job, food_id))
+
+
+def _run_job(food_id):
+    close_old_connections()
+
+    try:
+        process_photo(food_id)
+
+    except Exception:
+        logger.exception("Processing photo of food %s failed", food_id)
+
+    finally:
+        connection.close()
+
+
+def process_photo(food_id):
+    food = FavouriteFood.objects.filter(pk=food_id).first()
+
+    if not food or not food.photo:
+        return
+
+    try:
+        with food.photo.open("rb") as photo:
+            image = Image.open(photo)
+            image.load()
+
+    except (OSError, Image.DecompressionBombError):
+        logger.warning("Food %s has an unreadable photo %s", food_id, food.photo.name)
+        return
+
+    thumbnail = encode_progressive_jpeg(image, settings.PHOTO_THUMBNAIL_SIZE)
+
+    name = food.thumbnail.field.generate_filename(
+        food, os.path.basename(food.photo.name)
+    )
+    name = food.thumbnail.storage.save(name, ContentFile(thumbnail))
+
+    FavouriteFood.objects.filter(pk=food_id).update(thumbnail=name)
+
+
+def encode_progressive_jpeg(image, size):
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    image.thumbnail((size, size))
+
+    output = BytesIO()
+    image.save(
+        output,
+        "JPEG",
+        quality=settings.PHOTO_THUMBNAIL_QUALITY,
+        optimize=True,
+        progressive=True,
+    )
+
+    return output.getvalue()
@@ -0,0 +1,26 @@
+from contextvars import ContextVar
+
+from django.db import connections
+
+REPLICA = "replica"
+
+replica_reads = ContextVar("replica_reads", default=False)
+
+
+class ReplicaRouter:
+    # reads go to the replica only inside views marked with
+    # app.decorators.read_from_replica, so everything else reads its own writes
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and REPLICA in connections.databases:
+            return REPLICA
+
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
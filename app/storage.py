@@ -0,0 +1,51 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def file_digest(file):
+    digest = hashlib.sha256()
+
+    for chunk in file.chunks():
+        digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def content_addressed_name(directory, digest, extension):
+    return os.path.join(directory, digest[:2], digest + extension.lower())
+
+
+def name_digest(name):
+    # the SHA-256 in a content-addressed name, None for any other name
+    digest = os.path.splitext(os.path.basename(name))[0]
+
+    return digest if DIGEST_RE.match(digest) else None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    # Files are named after the SHA-256 of their content, so saving the same
+    # bytes twice returns the existing name instead of writing a copy.
+
+    def content_name(self, name, content):
+        directory, file_name = os.path.split(name)
+        extension = os.path.splitext(file_name)[1]
+
+        return content_addressed_name(directory, file_digest(content), extension)
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+
+        if self.exists(name):
+            return name
+
+        return super()._save(name, content)
+
+
+photo_storage = ContentAddressedStorage()
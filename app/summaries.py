@@ -0,0 +1,98 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import FavouriteFood, FormSummary
+
+
+def summarise_users(users):
+    users = users.annotate(
+        open_count=Count("favouritefood", filter=Q(favouritefood__completed=False)),
+        completed_count=Count("favouritefood", filter=Q(favouritefood__completed=True)),
+        last_completed_at=Max("favouritefood__completed_at"),
+    ).values_list("pk", "open_count", "completed_count", "last_completed_at")
+
+    for pk, open_count, completed_count, last_completed_at in users.iterator():
+        yield FormSummary(
+            user_id=pk,
+            open_count=open_count,
+            completed_count=completed_count,
+            last_completed_at=last_completed_at,
+        )
+
+
+def rebuild_form_summaries(user_ids=None, batch_size=500):
+    users = User.objects.all()
+    summaries = FormSummary.objects.all()
+
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+        summaries = summaries.filter(user_id__in=user_ids)
+
+    with transaction.atomic():
+        summaries.delete()
+        created = FormSummary.objects.bulk_create(
+            summarise_users(users), batch_size=batch_size
+        )
+
+    return len(created)
+
+
+def update_form_summaries(
+    user_ids, opened=0, completed=0, completed_at=None, batch_size=500
+):
+    # must run in the transaction that changed the forms, after the change,
+    # so a missing summary can be rebuilt from the rows themselves
+    changes = {
+        "open_count": F("open_count") + opened - completed,
+        "completed_count": F("completed_count") + completed,
+    }
+
+    if completed_at:
+        # imports can complete forms earlier than the latest one
+        changes["last_completed_at"] = Greatest(
+            Coalesce("last_completed_at", Value(completed_at)), Value(completed_at)
+        )
+
+    user_ids = list(user_ids)
+
+    # in batches, so no query has more parameters than the backend allows
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start : start + batch_size]
+        summaries = FormSummary.objects.filter(user_id__in=batch)
+        updated = summaries.update(**changes)
+
+        if updated == len(batch):
+            continue
+
+        missing = batch
+
+        if updated:
+            existing = set(summaries.values_list("user_id", flat=True))
+            missing = [pk for pk in batch if pk not in existing]
+
+        FormSummary.objects.bulk_create(
+            summarise_users(User.objects.filter(pk__in=missing)),
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+
+
+def discount_deleted_form(sender, instance, **kwargs):
+    # deleting a user deletes their summary along with their forms, so only
+    # forms deleted on their own need this
+    if not instance.completed:
+        FormSummary.objects.filter(user_id=instance.user_id).update(
+            open_count=F("open_count") - 1
+        )
+        return
+
+    latest = FavouriteFood.objects.filter(
+        user_id=OuterRef("user_id"), completed=True
+    ).order_by("-completed_at")
+
+    FormSummary.objects.filter(user_id=instance.user_id).update(
+        completed_count=F("completed_count") - 1,
+        last_completed_at=Subquery(latest.values("completed_at")[:1]),
+    )
@@ -0,0 +1,34 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # nothing the suite writes outside the test database should outlive
+        # the run or be shared with a server or another run
+        self.directory = tempfile.mkdtemp()
+        self.test_settings = override_settings(
+            QUERY_BUDGET_STRICT=True,
+            LOGIN_THROTTLE_DB=os.path.join(self.directory, "throttle.sqlite3"),
+            METRICS_DIR=os.path.join(self.directory, "metrics"),
+            MEDIA_ROOT=os.path.join(self.directory, "media"),
+            CACHES={
+                **settings.CACHES,
+                "shared": {
+                    **settings.CACHES["shared"],
+                    "LOCATION": os.path.join(self.directory, "cache.sqlite3"),
+                },
+            },
+        )
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        shutil.rmtree(self.directory)
+        super().teardown_test_environment(**kwargs)
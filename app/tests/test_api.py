@@ -0,0 +1,125 @@
+from django.test import TestCase
+from django.test import override_settings
+from django.contrib.auth.models import User
+from ..models import FavouriteFood
+from .test_helpers import generate_food_form_values, create_completed_food_form
+
+
+class TestJsonApi(TestCase):
+    def setUp(self):
+        self.admin = User(username="admin", is_superuser=True)
+        self.admin.set_password("password")
+        self.admin.save()
+        self.user = User(username="user", first_name="Jo", last_name="Bloggs")
+        self.user.set_password("password")
+        self.user.save()
+        self.random_user = User(username="random_user")
+        self.random_user.set_password("password")
+        self.random_user.save()
+
+    def test_login_required(self):
+        for url in ("/api/pending", "/api/history"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 400)
+
+    def test_pending_with_conditional_get(self):
+        assigned_food_form = FavouriteFood(user=self.user)
+        assigned_food_form.save()
+        self.client.login(username="user", password="password")
+
+        response = self.client.get("/api/pending")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "forms": [
+                    {"id": assigned_food_form.pk, "name": "Jo Bloggs", "email": ""}
+                ],
+                "count": 1,
+            },
+        )
+
+        etag = response["ETag"]
+        response = self.client.get("/api/pending", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        FavouriteFood(user=self.user).save()
+        response = self.client.get("/api/pending", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 2)
+
+    @override_settings(HISTORY_PAGE_SIZE=1)
+    def test_history_pages_and_etag(self):
+        first = create_completed_food_form(self.user)
+        second = create_completed_food_form(self.user)
+        create_completed_food_form(self.random_user)
+        self.client.login(username="user", password="password")
+
+        response = self.client.get("/api/history")
+        data = response.json()
+        self.assertEqual([food["id"] for food in data["foods"]], [first.pk])
+        self.assertEqual(data["foods"][0]["photo"], "/photos/{}".format(first.pk))
+        self.assertEqual(data["foods"][0]["dob"], "2010-03-28")
+        self.assertEqual(data["next_cursor"], first.pk)
+
+        response = self.client.get("/api/history", {"after": first.pk})
+        self.assertEqual([food["id"] for food in response.json()["foods"]], [second.pk])
+
+        etag = response["ETag"]
+        response = self.client.get(
+            "/api/history", {"after": first.pk}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get("/api/history", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        second.delete()
+        response = self.client.get(
+            "/api/history", {"after": first.pk}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["foods"], [])
+
+    def test_complete(self):
+        assigned_food_form = FavouriteFood(user=self.user)
+        assigned_food_form.save()
+        url = "/api/complete/{}".format(assigned_food_form.pk)
+        values = generate_food_form_values(user=self.user, file_name="test.jpg")
+
+        self.client.login(username="random_user", password="password")
+        response = self.client.post(url, data=values)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"error": "Unauthorized!"})
+
+        self.client.login(username="user", password="password")
+        response = self.client.post(url, data=values)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(), {"id": assigned_food_form.pk, "completed": True}
+        )
+
+        values = generate_food_form_values(user=self.user, file_name="test.jpg")
+        response = self.client.post(url, data=values)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"error": "This form has already been compeleted!"}
+        )
+
+    def test_complete_validation_errors(self):
+        assigned_food_form = FavouriteFood(user=self.user)
+        assigned_food_form.save()
+        self.client.login(username="user", password="password")
+
+        values = generate_food_form_values(
+            user=self.user, file_name="test.jpg", telephone="123"
+        )
+        response = self.client.post(
+            "/api/complete/{}".format(assigned_food_form.pk), data=values
+        )
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual(
+            errors["telephone"][0]["message"], "Telephone is in wrong format."
+        )
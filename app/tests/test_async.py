@@ -0,0 +1,278 @@
+import asyncio
+import importlib
+import json
+import time
+from django.http import HttpResponse
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings as django_settings
+from django.core.handlers.asgi import ASGIHandler
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test import RequestFactory, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.contrib.auth.models import AnonymousUser, User
+from django.urls import clear_url_caches, path
+from .. import async_views, photos, threads, urls
+from ..decorators import require_admin, require_auth
+from ..models import FavouriteFood
+from ..upload_handlers import LimitedASGIHandler
+from .test_helpers import (
+    TemporaryFilesMixin,
+    generate_food_form_values,
+    create_completed_food_form,
+    jpeg_file,
+)
+
+
+class TestAsyncViews(TemporaryFilesMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(self.reload_urls)
+        self.override_settings(ASYNC_VIEWS=True)
+        self.addCleanup(photos.shutdown_executor)
+        self.addCleanup(threads.shutdown_executor)
+        self.reload_urls()
+
+        self.admin = User(username="admin", is_superuser=True)
+        self.admin.set_password("password")
+        self.admin.save()
+        self.user = User(username="user")
+        self.user.set_password("password")
+        self.user.save()
+
+    def reload_urls(self):
+        # the root urlconf keeps its include() of app.urls, patterns and all
+        importlib.reload(urls)
+        importlib.reload(importlib.import_module(django_settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    def login(self, username):
+        # the async client can't log in from the event loop
+        self.client.login(username=username, password="password")
+        self.async_client.cookies = self.client.cookies
+
+    def get(self, path):
+        async def get():
+            return await self.async_client.get(path)
+
+        return async_to_sync(get)()
+
+    def test_urls_use_async_views(self):
+        self.assertIs(urls.pages, async_views)
+
+    def test_require_auth(self):
+        response = self.get("/dashboard/")
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+
+    def test_dashboard(self):
+        assigned_food_form = FavouriteFood(user=self.user)
+        assigned_food_form.save()
+        self.login("user")
+
+        response = self.get("/dashboard/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            "/complete-forms/{}".format(assigned_food_form.pk),
+            response.content.decode(),
+        )
+
+    def test_history_stream(self):
+        foods = [create_completed_food_form(self.user) for _ in range(3)]
+        self.login("user")
+
+        status, chunks = async_to_sync(self.asgi_get)("/history/", "stream=1")
+
+        self.assertEqual(status, 200)
+        content = b"".join(chunks).decode()
+        for food in foods:
+            self.assertIn("/photos/{}/thumbnail".format(food.pk), content)
+
+    def test_export_history(self):
+        foods = [create_completed_food_form(self.user) for _ in range(3)]
+        self.login("admin")
+
+        status, chunks = async_to_sync(self.asgi_get)("/history/export", "format=jsonl")
+
+        # each row is sent as soon as it is read, not once the export is done
+        self.assertEqual(status, 200)
+        self.assertEqual(len(chunks), len(foods))
+        rows = [json.loads(chunk) for chunk in chunks]
+        self.assertEqual([row["id"] for row in rows], [f.pk for f in foods])
+
+    async def asgi_get(self, path, query_string):
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": query_string.encode(),
+            "headers": [
+                (b"host", b"testserver"),
+                (b"cookie", self.session_cookie().encode()),
+            ],
+        }
+
+        communicator = ApplicationCommunicator(LimitedASGIHandler(), scope)
+        await communicator.send_input({"type": "http.request"})
+        start = await communicator.receive_output(timeout=5)
+        chunks = []
+
+        while True:
+            message = await communicator.receive_output(timeout=5)
+            if not message.get("more_body"):
+                break
+            chunks.append(message["body"])
+
+        await communicator.wait(timeout=5)
+
+        return start["status"], chunks
+
+    def session_cookie(self):
+        return "{}={}".format(
+            django_settings.SESSION_COOKIE_NAME,
+            self.client.cookies[django_settings.SESSION_COOKIE_NAME].value,
+        )
+
+    def test_complete_forms(self):
+        assigned_food_form = FavouriteFood(user=self.user)
+        assigned_food_form.save()
+        self.login("user")
+
+        values = generate_food_form_values(user=self.user, file_name="test.jpg")
+        values["photo"] = jpeg_file("test.jpg")
+        status, headers = async_to_sync(self.asgi_post)(
+            "/complete-forms/{}".format(assigned_food_form.pk), values
+        )
+
+        self.assertEqual(status, 302)
+        self.assertEqual(headers[b"Location"], b"/dashboard")
+        assigned_food_form.refresh_from_db()
+        self.assertTrue(assigned_food_form.completed)
+
+    async def asgi_post(self, path, data):
+        # the 3.1 async test client can't read multipart bodies, so this goes
+        # through the real handler, which spools the body like a server would
+        body = encode_multipart(BOUNDARY, data)
+        csrf_token = "a" * 64
+        cookies = "{}; csrftoken={}".format(self.session_cookie(), csrf_token)
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": path,
+            "query_string": b"",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"content-type", MULTIPART_CONTENT.encode()),
+                (b"content-length", str(len(body)).encode()),
+                (b"cookie", cookies.encode()),
+                (b"x-csrftoken", csrf_token.encode()),
+            ],
+        }
+
+        communicator = ApplicationCommunicator(ASGIHandler(), scope)
+        await communicator.send_input({"type": "http.request", "body": body})
+        start = await communicator.receive_output(timeout=5)
+        await communicator.receive_output(timeout=5)
+        await communicator.wait(timeout=5)
+
+        return start["status"], dict(start["headers"])
+
+
+async def slow_view(request):
+    await asyncio.sleep(0.5)
+    return HttpResponse("ok")
+
+
+urlpatterns = [path("slow", slow_view)]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class TestAsgiHandler(SimpleTestCase):
+    async def request(self, handler, headers=(), body=b""):
+        scope = {
+            "type": "http",
+            "method": "POST" if body else "GET",
+            "path": "/slow",
+            "query_string": b"",
+            "headers": [(b"host", b"testserver")] + list(headers),
+        }
+        communicator = ApplicationCommunicator(handler, scope)
+        await communicator.send_input({"type": "http.request", "body": body})
+        start = await communicator.receive_output(timeout=5)
+        await communicator.receive_output(timeout=5)
+        await communicator.wait(timeout=5)
+
+        return start["status"]
+
+    def run_concurrently(self, handler, count):
+        async def run():
+            return await asyncio.gather(*(self.request(handler) for _ in range(count)))
+
+        start = time.perf_counter()
+        statuses = async_to_sync(run)()
+
+        return statuses, time.perf_counter() - start
+
+    def test_middleware_runs_requests_concurrently(self):
+        self.assertTrue(django_settings.MIDDLEWARE)
+
+        for instrumentation in (False, True):
+            with self.settings(INSTRUMENTATION_ENABLED=instrumentation):
+                statuses, duration = self.run_concurrently(LimitedASGIHandler(), 5)
+
+            self.assertEqual(statuses, [200] * 5)
+            self.assertLess(duration, 1.5)
+
+    @override_settings(ASGI_REQUEST_MAX_SIZE=10)
+    def test_oversized_body_is_refused(self):
+        handler = LimitedASGIHandler()
+
+        declared = [(b"content-length", b"11")]
+        status = async_to_sync(self.request)(handler, declared, b"x" * 11)
+        self.assertEqual(status, 413)
+
+        # no Content-Length, so it is counted while being read
+        status = async_to_sync(self.request)(handler, body=b"x" * 11)
+        self.assertEqual(status, 413)
+
+        status = async_to_sync(self.request)(handler, declared[:0], b"x" * 10)
+        self.assertNotEqual(status, 413)
+
+
+class TestAsyncDecorators(TestCase):
+    def setUp(self):
+        self.addCleanup(threads.shutdown_executor)
+        self.factory = RequestFactory()
+
+        async def view(request):
+            return HttpResponse("ok")
+
+        self.view = view
+
+    def test_require_auth(self):
+        view = require_auth(redirect_view="login")(self.view)
+        request = self.factory.get("/")
+        request.user = AnonymousUser()
+
+        response = async_to_sync(view)(request)
+
+        self.assertEqual(response.status_code, 302)
+
+        request.user = User(username="user")
+        response = async_to_sync(view)(request)
+
+        self.assertEqual(response.content, b"ok")
+
+    def test_require_admin(self):
+        view = require_admin()(self.view)
+        request = self.factory.get("/")
+        request.user = User(username="user")
+
+        response = async_to_sync(view)(request)
+
+        self.assertEqual(response.status_code, 401)
+
+        request.user = User(username="admin", is_superuser=True)
+        response = async_to_sync(view)(request)
+
+        self.assertEqual(response.content, b"ok")
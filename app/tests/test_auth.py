@@ -0,0 +1,156 @@
+import os
+from datetime import timedelta
+from http.cookies import SimpleCookie
+import mock
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import HASH_SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+from core.configs import ConfigEnvs
+from ..auth import UserCache, user_cache
+
+
+class TestUserCache(TestCase):
+    def setUp(self):
+        self.addCleanup(user_cache.clear)
+        self.addCleanup(caches["shared"].clear)
+        self.user = User(username="user")
+        self.user.set_password("password")
+        self.user.save()
+
+    def auth_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+
+        self.assertEqual(response.status_code, 200)
+        return [
+            query["sql"]
+            for query in queries
+            if '"django_session"' in query["sql"] or '"auth_user"' in query["sql"]
+        ]
+
+    def test_cached_user_skips_user_query(self):
+        self.client.login(username="user", password="password")
+
+        self.assertEqual(len(self.auth_queries("/dashboard/")), 2)
+        queries = self.auth_queries("/dashboard/")
+        self.assertEqual(len(queries), 1)
+        self.assertIn("django_session", queries[0])
+
+    def test_expired_session_is_not_served_from_cache(self):
+        self.client.login(username="user", password="password")
+        self.client.get("/dashboard/")
+
+        Session.objects.filter(session_key=self.client.session.session_key).update(
+            expire_date=timezone.now() - timedelta(seconds=1)
+        )
+
+        response = self.client.get("/dashboard/")
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+
+    def test_session_hash_is_checked_on_cache_hit(self):
+        self.client.login(username="user", password="password")
+        self.client.get("/dashboard/")
+
+        session = self.client.session
+        session[HASH_SESSION_KEY] = "stale"
+        session.save()
+
+        response = self.client.get("/dashboard/")
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+
+    def test_logout_invalidates(self):
+        self.client.login(username="user", password="password")
+        self.client.get("/dashboard/")
+        session_key = self.client.session.session_key
+        self.assertIsNotNone(user_cache.get(session_key))
+
+        self.client.post("/logout/")
+
+        self.assertIsNone(user_cache.get(session_key))
+        response = self.client.get("/dashboard/")
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+
+    def other_worker(self):
+        # a second client on the same session, whose cached user outlives
+        # what is done through the first the way another process's would
+        client = Client()
+        client.cookies = SimpleCookie(self.client.cookies)
+        client.get("/dashboard/")
+        entries = dict(user_cache.entries)
+
+        def restore():
+            user_cache.entries.update(entries)
+
+        return client, restore
+
+    def test_logout_in_another_worker_invalidates(self):
+        self.client.login(username="user", password="password")
+        client, restore = self.other_worker()
+
+        self.client.post("/logout/")
+        restore()
+
+        response = client.get("/dashboard/")
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+
+    def test_password_change_in_another_worker_invalidates(self):
+        self.client.login(username="user", password="password")
+        client, restore = self.other_worker()
+
+        self.user.set_password("changed")
+        self.user.save()
+        restore()
+
+        response = client.get("/dashboard/")
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+
+    def test_saving_user_invalidates(self):
+        self.client.login(username="user", password="password")
+        self.client.get("/dashboard/")
+
+        self.user.first_name = "Renamed"
+        self.user.save()
+
+        response = self.client.get("/dashboard/")
+        self.assertContains(response, "Renamed")
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_signed_cookie_sessions(self):
+        self.client.login(username="user", password="password")
+
+        queries = self.auth_queries("/dashboard/")
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("django_session", queries[0])
+        self.assertEqual(self.auth_queries("/dashboard/"), [])
+
+    @override_settings(AUTH_USER_CACHE_SIZE=2)
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = UserCache()
+        users = [User(pk=pk, username=str(pk)) for pk in range(3)]
+
+        cache.set("a", users[0])
+        cache.set("b", users[1])
+        cache.get("a")
+        cache.set("c", users[2])
+
+        self.assertEqual(cache.get("a")[0].username, "0")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c")[0].username, "2")
+
+    def test_session_modes(self):
+        with mock.patch.dict(os.environ, {"SESSION_MODE": "cached_db"}):
+            self.assertEqual(
+                ConfigEnvs.session_engine(),
+                "django.contrib.sessions.backends.cached_db",
+            )
+
+        with mock.patch.dict(os.environ, {"SESSION_MODE": "redis"}):
+            with self.assertRaises(EnvironmentError):
+                ConfigEnvs.session_engine()
@@ -0,0 +1,73 @@
+import os
+import re
+from datetime import datetime
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from .. import benchmarks
+from .test_helpers import TemporaryFilesMixin
+
+# the validators as they were before they were precompiled, the baseline the
+# validation micro-benchmarks are compared with
+
+
+def legacy_image_validator(value):
+    ext = os.path.splitext(value.name)[1]
+    valid = [".jpg", ".jpeg"]
+    if ext not in valid:
+        raise ValidationError("Unsupported file extension (upload jpg or jpeg files).")
+
+
+def legacy_date_validator(value):
+    dob = datetime(value.year, value.month, value.day)
+    present = datetime.now()
+    if dob > present:
+        raise ValidationError("Date of birth needs to be in the past.")
+
+
+def legacy_phone_validator(value):
+    is_correct = re.search(r"^07\d{9}$", value)
+    if not is_correct:
+        raise ValidationError("Telephone is in wrong format.")
+
+
+LEGACY_VALIDATORS = {
+    "image_validator": legacy_image_validator,
+    "date_validator": legacy_date_validator,
+    "phone_validator": legacy_phone_validator,
+}
+
+
+class TestBenchmarks(TemporaryFilesMixin, TestCase):
+    def test_run_reports_every_flow(self):
+        report = benchmarks.run([(2, 5)], iterations=2, open_forms=2)
+
+        self.assertEqual(
+            [result["flow"] for result in report["results"]], list(benchmarks.FLOWS)
+        )
+        for result in report["results"]:
+            self.assertEqual((result["users"], result["rows"]), (2, 5))
+            self.assertGreater(result["queries"]["max"], 0)
+            self.assertGreater(result["latency_ms"]["p50"], 0)
+            self.assertGreater(result["peak_memory_kb"], 0)
+
+        comparison = list(benchmarks.compare(report, report))
+        self.assertEqual(len(comparison), len(benchmarks.FLOWS))
+        self.assertEqual({row["queries_delta"] for row in comparison}, {0})
+
+    def test_validation_micro_benchmarks(self):
+        results = benchmarks.measure_validation(
+            iterations=10, rows=2, baselines=LEGACY_VALIDATORS
+        )
+
+        self.assertEqual(
+            [result["case"] for result in results],
+            ["phone_validator", "date_validator", "image_validator", "food_rows"],
+        )
+        for result in results:
+            self.assertGreater(result["after_us"], 0)
+            self.assertGreater(result["before_us"], 0)
+
+        results = benchmarks.measure_validation(iterations=10, rows=2)
+        self.assertEqual(
+            [set(result) for result in results[:3]], [{"case", "after_us"}] * 3
+        )
@@ -0,0 +1,49 @@
+import os
+import mock
+from django.test import SimpleTestCase
+from ..cache import SQLiteCache
+from .test_helpers import TemporaryFilesMixin
+
+
+class TestSQLiteCache(TemporaryFilesMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.temporary_directory(), "cache.sqlite3")
+
+    def cache(self, **options):
+        return SQLiteCache(self.path, {"OPTIONS": options})
+
+    def test_shared_between_instances(self):
+        worker1, worker2 = self.cache(), self.cache()
+
+        self.assertTrue(worker1.add("key", {"status": 200}))
+        self.assertFalse(worker2.add("key", "other"))
+        self.assertEqual(worker2.get("key"), {"status": 200})
+
+        worker2.set("key", "changed", timeout=None)
+        self.assertEqual(worker1.get("key"), "changed")
+        self.assertTrue(worker1.delete("key"))
+        self.assertIsNone(worker2.get("key"))
+
+    def test_expired_entries(self):
+        cache = self.cache()
+
+        with mock.patch("app.cache.time.time", return_value=1000):
+            cache.add("key", "first", timeout=10)
+
+        with mock.patch("app.cache.time.time", return_value=1011):
+            self.assertIsNone(cache.get("key"))
+            self.assertFalse(cache.has_key("key"))
+            self.assertTrue(cache.add("key", "second", timeout=10))
+            self.assertEqual(cache.get("key"), "second")
+
+    def test_culled_past_max_entries(self):
+        cache = self.cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+
+        for n in range(30):
+            cache.set("key{}".format(n), n, timeout=100 + n)
+
+        count = cache.connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        self.assertLessEqual(count, 10)
+        self.assertEqual(cache.get("key29"), 29)
+        self.assertIsNone(cache.get("key0"))
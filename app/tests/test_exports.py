@@ -0,0 +1,161 @@
+import csv
+import datetime
+import json
+import os
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import set_script_prefix
+from django.contrib.auth.models import User
+from .. import exports
+from ..models import FavouriteFood
+from .test_helpers import TemporaryFilesMixin, create_completed_food_form
+
+
+class TestExportHistory(TemporaryFilesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = "/history/export"
+        self.admin = User(username="admin", is_superuser=True)
+        self.admin.set_password("password")
+        self.admin.save()
+        self.user1 = User.objects.create(username="user1")
+        self.user2 = User.objects.create(username="user2")
+
+        self.food1 = create_completed_food_form(self.user1)
+        self.food2 = create_completed_food_form(self.user2)
+        FavouriteFood.objects.filter(pk=self.food1.pk).update(
+            completed_at=datetime.datetime(2020, 1, 2, 12, tzinfo=datetime.timezone.utc)
+        )
+        FavouriteFood.objects.filter(pk=self.food2.pk).update(
+            completed_at=datetime.datetime(2020, 1, 5, 12, tzinfo=datetime.timezone.utc)
+        )
+        FavouriteFood(user=self.user1).save()
+
+    def export(self, query=""):
+        response = self.client.get(self.url + query)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_admin_required(self):
+        user = User(username="user")
+        user.set_password("password")
+        user.save()
+        self.client.login(username="user", password="password")
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_export_csv(self):
+        self.client.login(username="admin", password="password")
+
+        lines = self.export().splitlines()
+
+        self.assertEqual(
+            lines[0],
+            "id,username,name,email,telephone,dob,food,completed_at,"
+            "photo_url,thumbnail_url",
+        )
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith("{},user1,".format(self.food1.pk)))
+        self.assertTrue(
+            lines[1].endswith(
+                ",http://testserver/photos/{0},"
+                "http://testserver/photos/{0}/thumbnail".format(self.food1.pk)
+            )
+        )
+
+    def test_csv_formulas_are_escaped(self):
+        FavouriteFood.objects.filter(pk=self.food1.pk).update(
+            name="=HYPERLINK(1)", food="+1", telephone="-1"
+        )
+        FavouriteFood.objects.filter(pk=self.food2.pk).update(name="@sum", food="ok")
+        self.client.login(username="admin", password="password")
+
+        rows = list(csv.DictReader(StringIO(self.export())))
+
+        self.assertEqual(
+            [(row["name"], row["food"], row["telephone"]) for row in rows],
+            [("'=HYPERLINK(1)", "'+1", "'-1"), ("'@sum", "ok", "07400000000")],
+        )
+
+        rows = [json.loads(line) for line in self.export("?format=jsonl").splitlines()]
+        self.assertEqual(rows[0]["name"], "=HYPERLINK(1)")
+
+    def test_photo_urls_under_a_script_prefix(self):
+        set_script_prefix("/v0/")
+        self.addCleanup(set_script_prefix, "/")
+
+        url = exports.photo_url_format("food_thumbnail", "https://example.com/{x}")
+
+        self.assertEqual(
+            url.format(10), "https://example.com/{x}/v0/photos/10/thumbnail"
+        )
+
+    def test_export_jsonl_with_filters(self):
+        self.client.login(username="admin", password="password")
+
+        rows = [json.loads(line) for line in self.export("?format=jsonl").splitlines()]
+        self.assertEqual([row["username"] for row in rows], ["user1", "user2"])
+        self.assertEqual(rows[0]["completed_at"], "2020-01-02T12:00:00+00:00")
+        self.assertEqual(rows[0]["dob"], "2010-03-28")
+
+        rows = self.export("?format=jsonl&since=2020-01-03").splitlines()
+        self.assertEqual([json.loads(row)["id"] for row in rows], [self.food2.pk])
+
+        rows = self.export("?format=jsonl&until=2020-01-02").splitlines()
+        self.assertEqual([json.loads(row)["id"] for row in rows], [self.food1.pk])
+
+        rows = self.export("?format=jsonl&user=user2").splitlines()
+        self.assertEqual([json.loads(row)["id"] for row in rows], [self.food2.pk])
+
+    def test_invalid_parameters(self):
+        self.client.login(username="admin", password="password")
+
+        for query in ("?format=xml", "?since=yesterday", "?until=2020-02-30"):
+            response = self.client.get(self.url + query)
+            self.assertEqual(response.status_code, 400)
+
+    def test_rows_are_read_in_chunks(self):
+        self.client.login(username="admin", password="password")
+
+        with self.settings(EXPORT_CHUNK_SIZE=1):
+            response = self.client.get(self.url)
+
+        with CaptureQueriesContext(connection) as queries:
+            content = b"".join(response.streaming_content)
+
+        self.assertEqual(len(content.splitlines()), 3)
+        self.assertEqual(len(queries), 1)
+        self.assertIn("ORDER BY", queries[0]["sql"])
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command(
+            "export_history",
+            "--format",
+            "jsonl",
+            "--user",
+            "user1",
+            "--base-url",
+            "https://food.example.com/",
+            stdout=out,
+        )
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(
+            rows[0]["photo_url"],
+            "https://food.example.com/photos/{}".format(self.food1.pk),
+        )
+
+        path = os.path.join(self.temporary_directory(), "history.csv")
+        call_command("export_history", "--since", "2020-01-03", "--output", path)
+
+        with open(path) as exported:
+            lines = exported.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("{},user2,".format(self.food2.pk)))
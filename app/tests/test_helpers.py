@@ -1,14 +1,31 @@
 import mock
+import shutil
+import tempfile
+from io import BytesIO
 from django.core.files import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from django.test import override_settings
 from ..models import FavouriteFood
 
 
+def jpeg_bytes(size=(800, 600)):
+    output = BytesIO()
+    Image.new("RGB", size, color=(200, 80, 40)).save(output, "JPEG")
+    return output.getvalue()
+
+
 def mock_file(file_name):
     file = mock.MagicMock(spec=File, name="FileMock")
     file.name = file_name
+    file.read.return_value = jpeg_bytes(size=(8, 8))
     return file
 
 
+def jpeg_file(file_name, size=(800, 600)):
+    return SimpleUploadedFile(file_name, jpeg_bytes(size), "image/jpeg")
+
+
 def generate_food_form_values(user, file_name, **kwarg):
     values = {
         "name": "sadegh",
@@ -36,3 +53,22 @@ def create_completed_food_form(user):
 
     food.save()
     return food
+
+
+class TemporaryFilesMixin:
+    # each test gets an empty MEDIA_ROOT of its own; directories and settings
+    # set up through these helpers are undone when the test ends
+    def setUp(self):
+        super().setUp()
+        self.media_root = self.temporary_directory()
+        self.override_settings(MEDIA_ROOT=self.media_root)
+
+    def temporary_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        return directory
+
+    def override_settings(self, **kwargs):
+        settings = override_settings(**kwargs)
+        settings.enable()
+        self.addCleanup(settings.disable)
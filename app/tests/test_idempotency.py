@@ -0,0 +1,143 @@
+import mock
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test import Client, RequestFactory, override_settings
+from django.contrib.auth.models import User
+from ..checks import check_shared_cache
+from ..decorators import idempotent
+from ..models import FavouriteFood, FormSummary
+from .test_helpers import generate_food_form_values
+
+
+class TestIdempotency(TestCase):
+    def setUp(self):
+        self.addCleanup(caches["shared"].clear)
+        self.admin = User(username="admin", is_superuser=True)
+        self.admin.set_password("password")
+        self.admin.save()
+        self.user = User(username="user")
+        self.user.set_password("password")
+        self.user.save()
+
+    def test_keys_rendered_in_forms(self):
+        FavouriteFood(user=self.user).save()
+        self.client.login(username="user", password="password")
+        response = self.client.get("/dashboard/")
+        self.assertContains(response, "?idempotency_key=")
+
+        self.client.login(username="admin", password="password")
+        response = self.client.get("/users/")
+        self.assertContains(response, "?idempotency_key=")
+
+    def test_repeated_assign_replays_response(self):
+        self.client.login(username="admin", password="password")
+        url = "/assign-forms/{}?idempotency_key=abc".format(self.user.pk)
+
+        first = self.client.post(url)
+        second = self.client.post(url)
+
+        self.assertRedirects(first, "/users/", fetch_redirect_response=False)
+        self.assertRedirects(second, "/users/", fetch_redirect_response=False)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(FavouriteFood.objects.filter(user=self.user).count(), 1)
+
+        self.client.post(url.replace("abc", "def"))
+        self.assertEqual(FavouriteFood.objects.filter(user=self.user).count(), 2)
+
+    def test_repeated_complete_replays_response(self):
+        assigned_food_form = FavouriteFood(user=self.user)
+        assigned_food_form.save()
+        self.client.login(username="user", password="password")
+        url = "/complete-forms/{}".format(assigned_food_form.pk)
+
+        values = generate_food_form_values(user=self.user, file_name="test.jpg")
+        first = self.client.post(url, data=values, HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertRedirects(first, "/dashboard", fetch_redirect_response=False)
+
+        with mock.patch("app.views.complete_assignment") as complete_assignment:
+            values = generate_food_form_values(user=self.user, file_name="test.jpg")
+            second = self.client.post(url, data=values, HTTP_IDEMPOTENCY_KEY="abc")
+
+        complete_assignment.assert_not_called()
+        self.assertRedirects(second, "/dashboard", fetch_redirect_response=False)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(FormSummary.objects.get(user=self.user).completed_count, 1)
+
+    def test_replay_skips_upload_and_csrf(self):
+        assigned_food_form = FavouriteFood(user=self.user)
+        assigned_food_form.save()
+        client = Client(enforce_csrf_checks=True)
+        client.login(username="user", password="password")
+        client.get("/dashboard/")
+        url = "/complete-forms/{}".format(assigned_food_form.pk)
+
+        values = generate_food_form_values(user=self.user, file_name="test.jpg")
+        forged = client.post(url, data=values, HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertEqual(forged.status_code, 403)
+
+        # the refused request is not replayed to the genuine one
+        values = generate_food_form_values(user=self.user, file_name="test.jpg")
+        values["csrfmiddlewaretoken"] = client.cookies["csrftoken"].value
+        first = client.post(url, data=values, HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertRedirects(first, "/dashboard", fetch_redirect_response=False)
+        self.assertFalse(first.has_header("Idempotent-Replayed"))
+
+        with mock.patch("app.views.LimitedJPEGUploadHandler") as upload_handler:
+            values = generate_food_form_values(user=self.user, file_name="test.jpg")
+            second = client.post(url, data=values, HTTP_IDEMPOTENCY_KEY="abc")
+
+        upload_handler.assert_not_called()
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertRedirects(second, "/dashboard", fetch_redirect_response=False)
+
+    @override_settings(DEBUG=False)
+    def test_shared_cache_must_be_shared(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+        locmem = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        with self.settings(CACHES={"default": locmem, "shared": locmem}):
+            self.assertEqual(check_shared_cache(None)[0].id, "app.E001")
+
+    def test_keys_are_scoped_to_user(self):
+        self.client.login(username="admin", password="password")
+        self.client.post("/assign-forms/{}?idempotency_key=abc".format(self.user.pk))
+
+        other_admin = User(username="admin2", is_superuser=True)
+        other_admin.set_password("password")
+        other_admin.save()
+        self.client.login(username="admin2", password="password")
+        response = self.client.post(
+            "/assign-forms/{}?idempotency_key=abc".format(self.user.pk)
+        )
+
+        self.assertFalse(response.has_header("Idempotent-Replayed"))
+        self.assertEqual(FavouriteFood.objects.filter(user=self.user).count(), 2)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_repeat_of_running_request_conflicts(self):
+        outcomes = []
+
+        @idempotent
+        def view(request):
+            outcomes.append(view(request).status_code)
+            return HttpResponse("ok")
+
+        request = RequestFactory().post("/", HTTP_IDEMPOTENCY_KEY="abc")
+        request.user = self.user
+
+        self.assertEqual(view(request).content, b"ok")
+        self.assertEqual(outcomes, [409])
+        self.assertEqual(view(request).content, b"ok")
+        self.assertEqual(outcomes, [409])
+
+    def test_server_errors_are_not_stored(self):
+        @idempotent
+        def view(request):
+            return HttpResponse("error", status=503)
+
+        request = RequestFactory().post("/", HTTP_IDEMPOTENCY_KEY="abc")
+        request.user = self.user
+
+        view(request)
+        self.assertFalse(view(request).has_header("Idempotent-Replayed"))
@@ -0,0 +1,243 @@
+import datetime
+import json
+import os
+from io import StringIO
+import mock
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from .. import imports
+from ..models import FavouriteFood, FormSummary, ImportCheckpoint
+from .test_helpers import TemporaryFilesMixin, create_completed_food_form, jpeg_bytes
+
+
+class TestImportFoodRecords(TemporaryFilesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = self.temporary_directory()
+
+        self.user1 = User.objects.create(username="user1")
+        self.user2 = User.objects.create(username="user2")
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as source:
+            source.write(content)
+        return path
+
+    def import_records(self, path, *args):
+        out = StringIO()
+        call_command("import_food_records", path, *args, stdout=out)
+        return out.getvalue()
+
+    def csv_file(self):
+        return self.write(
+            "records.csv",
+            "username,name,email,telephone,dob,food,completed_at\n"
+            "user1,Jo,jo@example.com,07400000000,2010-03-28,Pizza,\n"
+            "user2,Al,al@example.com,07400000001,2011-04-01,Soup,2020-01-02T03:04:05\n"
+            "nobody,Ed,ed@example.com,123,2010-03-28,Tea,\n"
+            "user1,Jo,jo@example.com,07400000000,2010-03-28,Pasta,\n",
+        )
+
+    def test_import_csv(self):
+        errors = os.path.join(self.directory, "errors.jsonl")
+
+        output = self.import_records(
+            self.csv_file(), "--chunk-size", "2", "--errors", errors
+        )
+
+        self.assertIn("3 records imported, 1 rows rejected.", output)
+        self.assertEqual(
+            sorted(FavouriteFood.objects.values_list("food", flat=True)),
+            ["Pasta", "Pizza", "Soup"],
+        )
+        self.assertFalse(FavouriteFood.objects.filter(completed=False).exists())
+        self.assertEqual(FormSummary.objects.get(user=self.user1).completed_count, 2)
+        self.assertEqual(
+            FavouriteFood.objects.get(food="Soup").completed_at.isoformat(),
+            "2020-01-02T03:04:05+00:00",
+        )
+
+        with open(errors) as rejected:
+            rejected = [json.loads(line) for line in rejected]
+        self.assertEqual(rejected[0]["row"], 3)
+        self.assertEqual(set(rejected[0]["errors"]), {"username", "telephone"})
+
+    def test_resumes_from_checkpoint(self):
+        path = self.csv_file()
+        import_chunk = imports.import_chunk
+        calls = []
+
+        def interrupted(records, photo_root, checkpoint):
+            calls.append(records)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return import_chunk(records, photo_root, checkpoint=checkpoint)
+
+        with mock.patch(
+            "app.management.commands.import_food_records.import_chunk", interrupted
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                self.import_records(path, "--chunk-size", "2")
+
+        self.assertEqual(FavouriteFood.objects.count(), 2)
+
+        output = self.import_records(path, "--chunk-size", "2")
+        self.assertIn("3 records imported, 1 rows rejected.", output)
+        self.assertEqual(FavouriteFood.objects.count(), 3)
+
+        self.import_records(path)
+        self.assertEqual(FavouriteFood.objects.count(), 3)
+
+    def test_resume_seeks_to_offset(self):
+        path = self.csv_file()
+        records = list(imports.read_records(path))
+        offset = records[1][1]
+
+        self.assertEqual(
+            [record for record, _ in imports.read_records(path, offset=offset)],
+            [record for record, _ in records[2:]],
+        )
+
+        self.import_records(path, "--chunk-size", "2")
+
+        checkpoint = ImportCheckpoint.objects.get(name=path)
+        self.assertEqual(checkpoint.offset, os.path.getsize(path))
+
+        with mock.patch.object(imports.csv, "reader", wraps=imports.csv.reader):
+            output = self.import_records(path)
+            # only the header is parsed again
+            self.assertEqual(imports.csv.reader.call_count, 2)
+
+        self.assertIn("3 records imported, 1 rows rejected.", output)
+        self.assertEqual(FavouriteFood.objects.count(), 3)
+
+    def test_checkpoint_commits_with_its_chunk(self):
+        path = self.csv_file()
+        save = ImportCheckpoint.save
+        calls = []
+
+        def crash_on_second_chunk(checkpoint, *args, **kwargs):
+            calls.append(checkpoint.rows)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return save(checkpoint, *args, **kwargs)
+
+        with mock.patch.object(ImportCheckpoint, "save", crash_on_second_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                self.import_records(path, "--chunk-size", "2")
+
+        # the second chunk's rows went with its checkpoint
+        self.assertEqual(FavouriteFood.objects.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get(name=path).rows, 2)
+
+        output = self.import_records(path, "--chunk-size", "2")
+        self.assertIn("3 records imported, 1 rows rejected.", output)
+        self.assertEqual(FavouriteFood.objects.count(), 3)
+
+    def test_restart(self):
+        path = self.csv_file()
+        self.import_records(path)
+
+        output = self.import_records(path, "--restart")
+
+        self.assertIn("3 records imported, 1 rows rejected.", output)
+        self.assertEqual(FavouriteFood.objects.count(), 6)
+
+    def test_malformed_jsonl_lines_are_rejected(self):
+        record = json.dumps(
+            {
+                "username": "user1",
+                "name": "Jo",
+                "email": "jo@example.com",
+                "telephone": "07400000000",
+                "dob": "2010-03-28",
+                "food": "Pizza",
+            }
+        )
+        path = self.write(
+            "records.jsonl",
+            "\n".join([record, "{not json", "", "[1, 2]", record]) + "\n\n",
+        )
+        errors = os.path.join(self.directory, "errors.jsonl")
+
+        output = self.import_records(path, "--chunk-size", "3", "--errors", errors)
+
+        self.assertIn("2 records imported, 2 rows rejected.", output)
+        with open(errors) as rejected:
+            rejected = [json.loads(line) for line in rejected]
+        self.assertEqual([row["row"] for row in rejected], [2, 3])
+        self.assertEqual(
+            rejected[1]["errors"], {"__all__": ["Line is not a JSON object."]}
+        )
+
+    def test_summaries_are_updated_per_chunk(self):
+        latest = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+        food = create_completed_food_form(self.user2)
+        FavouriteFood.objects.filter(pk=food.pk).update(completed_at=latest)
+        FavouriteFood(user=self.user1).save()
+        call_command("rebuild_form_summaries", stdout=StringIO())
+
+        with mock.patch("app.summaries.summarise_users") as summarise_users:
+            self.import_records(self.csv_file(), "--chunk-size", "1")
+
+        # existing summaries are adjusted, never recounted from the rows
+        summarise_users.assert_not_called()
+        summary = FormSummary.objects.get(user=self.user1)
+        self.assertEqual((summary.open_count, summary.completed_count), (1, 2))
+        summary = FormSummary.objects.get(user=self.user2)
+        self.assertEqual((summary.open_count, summary.completed_count), (0, 2))
+        self.assertEqual(summary.last_completed_at, latest)
+
+    def test_import_jsonl_with_photos(self):
+        with open(os.path.join(self.directory, "jo.jpg"), "wb") as photo:
+            photo.write(jpeg_bytes())
+
+        record = {
+            "username": "user1",
+            "name": "Jo",
+            "email": "jo@example.com",
+            "telephone": "07400000000",
+            "dob": "2010-03-28",
+            "food": "Pizza",
+        }
+        path = self.write(
+            "records.jsonl",
+            "\n".join(
+                json.dumps({**record, "photo": photo})
+                for photo in ("jo.jpg", "missing.jpg", "jo.png")
+            ),
+        )
+
+        output = self.import_records(path)
+
+        self.assertIn("1 records imported, 2 rows rejected.", output)
+        food = FavouriteFood.objects.get()
+        self.assertTrue(food.photo.name.startswith("uploads/"))
+        self.assertTrue(food.photo.storage.exists(food.photo.name))
+
+    def test_imported_photos_get_thumbnails(self):
+        with open(os.path.join(self.directory, "jo.jpg"), "wb") as photo:
+            photo.write(jpeg_bytes())
+
+        path = self.write(
+            "records.jsonl",
+            json.dumps(
+                {
+                    "username": "user1",
+                    "name": "Jo",
+                    "email": "jo@example.com",
+                    "telephone": "07400000000",
+                    "dob": "2010-03-28",
+                    "food": "Pizza",
+                    "photo": "jo.jpg",
+                }
+            )
+            + "\n",
+        )
+
+        with mock.patch("app.imports.schedule_photo_processing") as schedule:
+            self.import_records(path)
+
+        schedule.assert_called_once_with(FavouriteFood.objects.get().pk)
@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+from django.test import TestCase
+from django.test import RequestFactory, override_settings
+from django.contrib.auth.models import User
+from ..models import FavouriteFood
+from ..instrumentation import InstrumentationMiddleware
+from .test_helpers import TemporaryFilesMixin
+
+
+@override_settings(INSTRUMENTATION_ENABLED=True)
+class TestInstrumentationMiddleware(TemporaryFilesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User(username="user")
+        self.user.set_password("password")
+        self.user.save()
+        FavouriteFood(user=self.user).save()
+
+    def test_server_timing_header(self):
+        self.client.login(username="user", password="password")
+
+        with self.assertLogs("app.instrumentation", level="INFO") as logs:
+            response = self.client.get("/dashboard/")
+
+        timings = {
+            entry.split(";")[0]: entry
+            for entry in response["Server-Timing"].split(", ")
+        }
+        self.assertEqual(set(timings), {"view", "db", "form", "render"})
+        self.assertTrue('desc="4x"' in timings["db"])
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record["path"], "/dashboard/")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["spans"]["db"]["count"], 4)
+
+    @override_settings(INSTRUMENTATION_ENABLED=False)
+    def test_disabled_by_default(self):
+        response = self.client.get("/")
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    def test_slow_requests_are_profiled(self):
+        profile_dir = self.temporary_directory()
+
+        with self.settings(
+            INSTRUMENTATION_PROFILE_RATE=1.0,
+            INSTRUMENTATION_SLOW_MS=0,
+            INSTRUMENTATION_PROFILE_DIR=profile_dir,
+        ):
+            self.client.get("/")
+
+        dumps = os.listdir(profile_dir)
+        self.assertEqual(len(dumps), 1)
+        self.assertTrue(dumps[0].endswith(".prof"))
+
+    def test_fast_requests_are_not_profiled(self):
+        profile_dir = self.temporary_directory()
+
+        with self.settings(
+            INSTRUMENTATION_PROFILE_RATE=1.0,
+            INSTRUMENTATION_SLOW_MS=60 * 1000,
+            INSTRUMENTATION_PROFILE_DIR=profile_dir,
+        ):
+            self.client.get("/")
+
+        self.assertEqual(os.listdir(profile_dir), [])
+
+    def test_profiler_stopped_when_view_raises(self):
+        def get_response(request):
+            raise ValueError
+
+        with self.settings(INSTRUMENTATION_PROFILE_RATE=1.0):
+            middleware = InstrumentationMiddleware(get_response)
+
+            with self.assertRaises(ValueError):
+                middleware(RequestFactory().get("/"))
+
+        self.assertIsNone(sys.getprofile())
@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+import mock
+from django.test import TestCase
+from django.contrib.auth.models import User
+from ..models import FavouriteFood
+from ..metrics import MetricsRegistry, MmapValues, read_file, registry
+from .test_helpers import TemporaryFilesMixin, create_completed_food_form
+
+
+class TestMetrics(TemporaryFilesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.metrics_dir = self.temporary_directory()
+        self.override_settings(METRICS_DIR=self.metrics_dir)
+
+        self.url = "/metrics"
+        self.admin = User(username="admin", is_superuser=True)
+        self.admin.set_password("password")
+        self.admin.save()
+        self.user = User(username="user")
+        self.user.set_password("password")
+        self.user.save()
+
+    def test_admin_required(self):
+        self.client.login(username="user", password="password")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    def test_request_and_business_metrics(self):
+        FavouriteFood(user=self.user).save()
+        create_completed_food_form(self.user)
+        self.client.login(username="admin", password="password")
+        self.client.post("/assign-forms/{}".format(self.user.pk))
+        self.client.get("/users/")
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        lines = response.content.decode("utf-8").splitlines()
+
+        self.assertTrue("app_forms_assigned_total 1" in lines)
+        self.assertTrue("app_forms_open 2" in lines)
+        self.assertTrue("app_forms_completed 1" in lines)
+        self.assertTrue('app_requests_total{view="users",status="200"} 1' in lines)
+        self.assertTrue(
+            'app_request_duration_seconds_bucket{view="users",le="+Inf"} 1' in lines
+        )
+        self.assertTrue('app_request_duration_seconds_count{view="users"} 1' in lines)
+
+    def test_values_from_every_worker_are_summed(self):
+        registry.inc("app_forms_completed_total", 2)
+        other_worker = MmapValues(os.path.join(self.metrics_dir, "1.db"))
+        other_worker.add('["app_forms_completed_total", []]', 3)
+
+        totals = registry.collect()
+        self.assertEqual(totals[("app_forms_completed_total", ())], 5)
+
+    def test_dead_workers_are_merged(self):
+        key = '["app_forms_completed_total", []]'
+        dead_pid = 4194305  # past the largest pid Linux hands out
+
+        MmapValues(os.path.join(self.metrics_dir, "1.db")).add(key, 3)
+        dead = os.path.join(self.metrics_dir, "{}.db".format(dead_pid))
+        MmapValues(dead).add(key, 4)
+
+        fresh = MetricsRegistry()
+        fresh.inc("app_forms_completed_total", 2)
+
+        self.assertFalse(os.path.exists(dead))
+        self.assertEqual(
+            sorted(os.listdir(self.metrics_dir)),
+            sorted(["1.db", "{}.db".format(os.getpid())]),
+        )
+        totals = fresh.collect()
+        self.assertEqual(totals[("app_forms_completed_total", ())], 9)
+
+    def test_first_use_from_many_threads(self):
+        fresh = MetricsRegistry()
+        opened = []
+
+        def open_values(path):
+            opened.append(path)
+            # widen the window in which the threads race to create the file
+            time.sleep(0.05)
+            return MmapValues(path)
+
+        def inc(n):
+            fresh.inc("app_forms_completed_total", labels=(("n", str(n)),))
+
+        with mock.patch("app.metrics.MmapValues", side_effect=open_values):
+            threads = []
+            for n in range(8):
+                thread = threading.Thread(target=inc, args=(n,))
+                thread.start()
+                threads.append(thread)
+                thread.join(0.001)
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(opened), 1)
+        self.assertEqual(len(read_file(opened[0])), 8)
+
+    def test_values_file_grows(self):
+        path = os.path.join(self.metrics_dir, "1.db")
+        values = MmapValues(path)
+        for index in range(5000):
+            values.add("key{}".format(index), index)
+        values.add("key42", 1)
+
+        reopened = MmapValues(path)
+        reopened.add("key4999", 1)
+
+        saved = read_file(path)
+        self.assertEqual(len(saved), 5000)
+        self.assertEqual(saved["key42"], 43)
+        self.assertEqual(saved["key4999"], 5000)
+        self.assertGreater(os.path.getsize(path), 64 * 1024)
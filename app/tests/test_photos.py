@@ -0,0 +1,221 @@
+import hashlib
+import os
+from io import StringIO
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.test import override_settings
+from django.contrib.auth.models import User
+from ..models import FavouriteFood
+from ..photos import process_photo
+from ..storage import ContentAddressedStorage
+from .test_helpers import TemporaryFilesMixin, create_completed_food_form, jpeg_file
+
+
+class TestPhotoProcessing(TemporaryFilesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User(username="user")
+        self.user.set_password("password")
+        self.user.save()
+
+    def test_thumbnail_is_generated(self):
+        food = FavouriteFood(user=self.user, completed=True)
+        food.photo.save("food.jpg", jpeg_file("food.jpg"))
+
+        process_photo(food.pk)
+
+        food.refresh_from_db()
+        self.assertTrue(food.thumbnail.name.startswith("uploads/thumbnails/"))
+
+        with food.thumbnail.open("rb") as thumbnail:
+            image = Image.open(thumbnail)
+            self.assertEqual(image.format, "JPEG")
+            self.assertTrue(image.info.get("progressive"))
+            self.assertEqual(max(image.size), 200)
+
+        self.assertLess(food.thumbnail.size, food.photo.size)
+
+    def test_unreadable_photo_is_skipped(self):
+        food = create_completed_food_form(self.user)
+
+        process_photo(food.pk)
+
+        food.refresh_from_db()
+        self.assertFalse(food.thumbnail)
+
+    def test_history_uses_thumbnail(self):
+        food = FavouriteFood(user=self.user, completed=True)
+        food.photo.save("food.jpg", jpeg_file("food.jpg"))
+        process_photo(food.pk)
+        food.refresh_from_db()
+
+        self.client.login(username="user", password="password")
+        response = self.client.get("/history/")
+        content = response.content.decode("utf-8")
+        self.assertTrue("/photos/{}/thumbnail".format(food.pk) in content)
+        self.assertFalse(food.photo.url in content)
+
+        response = self.client.get("/photos/{}/thumbnail".format(food.pk))
+        self.assertEqual(b"".join(response.streaming_content), food.thumbnail.read())
+
+
+class TestContentAddressedStorage(TemporaryFilesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = ContentAddressedStorage(location=self.media_root)
+
+    def test_same_content_is_stored_once(self):
+        first = self.storage.save("uploads/test.jpg", ContentFile(b"food"))
+        second = self.storage.save("uploads/other.JPG", ContentFile(b"food"))
+        third = self.storage.save("uploads/test.jpg", ContentFile(b"other food"))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, third)
+        self.assertTrue(first.startswith("uploads/"))
+        self.assertTrue(first.endswith(".jpg"))
+        self.assertEqual(len(self.storage.listdir("uploads")[0]), 2)
+
+    def write_upload(self, file_name, content):
+        os.makedirs(os.path.join(self.media_root, "uploads"), exist_ok=True)
+        with open(os.path.join(self.media_root, "uploads", file_name), "wb") as file:
+            file.write(content)
+        return "uploads/" + file_name
+
+    def test_dedupe_uploads_command(self):
+        user = User.objects.create(username="user")
+        food_storage = FavouriteFood._meta.get_field("photo").storage
+
+        for file_name in ("test.jpg", "test_1d788M6.jpg", "other.jpg"):
+            content = b"other" if file_name == "other.jpg" else b"food"
+            name = self.write_upload(file_name, content)
+            FavouriteFood.objects.create(user=user, photo=name, completed=True)
+
+        call_command("dedupe_uploads", stdout=StringIO())
+
+        names = set(FavouriteFood.objects.values_list("photo", flat=True))
+        self.assertEqual(len(names), 2)
+        for name in names:
+            self.assertTrue(food_storage.exists(name))
+        self.assertEqual(food_storage.listdir("uploads")[1], [])
+
+    def test_dedupe_uploads_dry_run(self):
+        food_storage = FavouriteFood._meta.get_field("photo").storage
+        self.write_upload("test.jpg", b"food")
+        self.write_upload("test_1d788M6.jpg", b"food")
+
+        output = StringIO()
+        call_command("dedupe_uploads", "--dry-run", stdout=output)
+
+        self.assertTrue("2 files deduplicated into 1 unique files" in output.getvalue())
+        self.assertEqual(len(food_storage.listdir("uploads")[1]), 2)
+
+
+class TestFoodPhotoView(TemporaryFilesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User(username="admin", is_superuser=True)
+        self.admin.set_password("password")
+        self.admin.save()
+        self.user = User(username="user")
+        self.user.set_password("password")
+        self.user.save()
+        self.random_user = User(username="random_user")
+        self.random_user.set_password("password")
+        self.random_user.save()
+
+        self.food = FavouriteFood(user=self.user, completed=True)
+        self.food.photo.save("food.jpg", ContentFile(b"0123456789"))
+        self.url = "/photos/{}".format(self.food.pk)
+
+    def test_login_required(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_other_user_not_allowed(self):
+        self.client.login(username="random_user", password="password")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    def test_photo_not_found(self):
+        self.client.login(username="admin", password="password")
+        response = self.client.get("/photos/4400")
+        self.assertEqual(response.status_code, 404)
+
+    def test_owner_and_admin_allowed(self):
+        for username in ("user", "admin"):
+            self.client.login(username=username, password="password")
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+            self.assertEqual(
+                response["ETag"],
+                '"{}"'.format(hashlib.sha256(b"0123456789").hexdigest()),
+            )
+            self.assertTrue(response.has_header("Last-Modified"))
+            self.assertTrue(response["Cache-Control"].startswith("private"))
+            self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_if_none_match(self):
+        self.client.login(username="user", password="password")
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+        # the ETag follows the content, not the file's modification time
+        os.utime(self.food.photo.path, (0, 0))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        self.client.login(username="user", password="password")
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-3")
+        self.assertEqual(b"".join(response.streaming_content), b"789")
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=20-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+        # ranges that can't be served as one part get the whole file
+        for byte_range in ("bytes=0-1,4-5", "bytes=5-2", "bytes=a-b", "lines=1-2"):
+            response = self.client.get(self.url, HTTP_RANGE=byte_range)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+
+        response = self.client.get(
+            self.url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_thumbnail_falls_back_to_photo(self):
+        self.client.login(username="user", password="password")
+        response = self.client.get(self.url + "/thumbnail")
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+
+    @override_settings(MEDIA_SENDFILE="x-accel-redirect")
+    def test_accel_redirect(self):
+        self.client.login(username="user", password="password")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response["X-Accel-Redirect"], "/protected-media/" + self.food.photo.name
+        )
+        self.assertEqual(response.content, b"")
+
+    @override_settings(MEDIA_SENDFILE="x-sendfile")
+    def test_sendfile(self):
+        self.client.login(username="user", password="password")
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Sendfile"], self.food.photo.path)
@@ -0,0 +1,81 @@
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db import connection
+from django.test import TestCase
+from django.test import RequestFactory, override_settings
+from django.contrib.auth.models import User
+from ..decorators import query_budget
+from ..decorators import QueryBudgetExceeded
+
+
+class TestQueryBudget(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get("/")
+
+        def view(request, queries):
+            for _ in range(queries):
+                User.objects.exists()
+            return HttpResponse("ok")
+
+        self.view = query_budget(queries=2)(view)
+
+    def test_within_budget(self):
+        response = self.view(self.request, 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.request.query_stats.count, 2)
+        self.assertGreater(self.request.query_stats.time, 0)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_over_budget_fails_in_strict_mode(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.view(self.request, 3)
+
+    @override_settings(QUERY_BUDGET_STRICT=True, QUERY_BUDGET_TIME_MS=0)
+    def test_slow_queries_are_only_logged(self):
+        with self.assertLogs("app.decorators", level="WARNING") as logs:
+            response = self.view(self.request, 1)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue("view ran 1 queries" in logs.output[0])
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_streamed_queries_are_counted(self):
+        def view(request, queries):
+            def rows():
+                for _ in range(queries):
+                    yield str(User.objects.exists())
+
+            return StreamingHttpResponse(rows())
+
+        view = query_budget(queries=2)(view)
+
+        response = view(self.request, 2)
+        self.assertEqual(b"".join(response.streaming_content), b"FalseFalse")
+        self.assertEqual(self.request.query_stats.count, 2)
+
+        response = view(self.request, 3)
+        with self.assertRaises(QueryBudgetExceeded):
+            b"".join(response.streaming_content)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_only_the_stream_is_counted(self):
+        def view(request):
+            return StreamingHttpResponse(str(User.objects.exists()) for _ in range(2))
+
+        response = query_budget(queries=2)(view)(self.request)
+        chunks = iter(response.streaming_content)
+        next(chunks)
+
+        # queries made between chunks, or after the client goes away, aren't
+        self.assertEqual(connection.execute_wrappers, [])
+        User.objects.exists()
+        User.objects.exists()
+        self.assertEqual(b"".join(chunks), b"False")
+        self.assertEqual(self.request.query_stats.count, 2)
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_over_budget_is_logged(self):
+        with self.assertLogs("app.decorators", level="WARNING") as logs:
+            response = self.view(self.request, 3)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue("view ran 3 queries" in logs.output[0])
@@ -0,0 +1,113 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User
+from ..helpers import bulk_assign_forms
+from ..models import FavouriteFood, FormSummary
+from .test_helpers import generate_food_form_values, create_completed_food_form
+
+
+class TestFormSummaries(TestCase):
+    def setUp(self):
+        self.admin = User(username="admin", is_superuser=True)
+        self.admin.set_password("password")
+        self.admin.save()
+        self.user = User(username="user")
+        self.user.set_password("password")
+        self.user.save()
+
+    def summary(self):
+        return FormSummary.objects.get(user=self.user)
+
+    def test_assign_and_complete_update_summary(self):
+        self.client.login(username="admin", password="password")
+        self.client.post("/assign-forms/{}".format(self.user.pk))
+        self.client.post("/assign-forms/{}".format(self.user.pk))
+        self.assertEqual(
+            (self.summary().open_count, self.summary().completed_count), (2, 0)
+        )
+
+        self.client.login(username="user", password="password")
+        assigned_form_id = FavouriteFood.objects.filter(user=self.user).first().pk
+        values = generate_food_form_values(user=self.user, file_name="test.jpg")
+        self.client.post("/complete-forms/{}".format(assigned_form_id), data=values)
+
+        summary = self.summary()
+        self.assertEqual((summary.open_count, summary.completed_count), (1, 1))
+        food = FavouriteFood.objects.get(pk=assigned_form_id)
+        self.assertEqual(summary.last_completed_at, food.completed_at)
+
+        response = self.client.get("/dashboard/")
+        self.assertEqual(response.context["summary"], summary)
+
+    def test_bulk_assign_updates_summary(self):
+        FavouriteFood(user=self.user).save()
+        FormSummary.objects.create(user=self.user, open_count=1)
+        other = User.objects.create(username="other")
+
+        self.client.login(username="admin", password="password")
+        self.client.post("/assign-forms/bulk", {"user_ids": [self.user.pk, other.pk]})
+
+        self.assertEqual(self.summary().open_count, 2)
+        self.assertEqual(FormSummary.objects.get(user=other).open_count, 1)
+
+    def test_bulk_assign_in_batches(self):
+        others = [User.objects.create(username="user{}".format(n)) for n in range(4)]
+        user_ids = [self.user.pk] + [other.pk for other in others]
+
+        # three batches of candidates, inserts and summary updates, each with
+        # at most two ids
+        with self.assertNumQueries(17):
+            created, skipped = bulk_assign_forms(user_ids, batch_size=2)
+
+        self.assertEqual((created, skipped), (5, 0))
+        self.assertEqual(
+            sorted(FormSummary.objects.values_list("user_id", "open_count")),
+            sorted((pk, 1) for pk in user_ids),
+        )
+
+    def test_deleting_forms_updates_summary(self):
+        earlier = create_completed_food_form(self.user)
+        latest = create_completed_food_form(self.user)
+        FavouriteFood(user=self.user).save()
+        call_command("rebuild_form_summaries", stdout=StringIO())
+
+        FavouriteFood.objects.filter(user=self.user, completed=False).delete()
+        latest.delete()
+
+        summary = self.summary()
+        self.assertEqual((summary.open_count, summary.completed_count), (0, 1))
+        earlier.refresh_from_db()
+        self.assertEqual(summary.last_completed_at, earlier.completed_at)
+
+        user_id = self.user.pk
+        self.user.delete()
+        self.assertFalse(FormSummary.objects.filter(user_id=user_id).exists())
+
+    def test_users_list_shows_counts(self):
+        create_completed_food_form(self.user)
+        FavouriteFood(user=self.user).save()
+        call_command("rebuild_form_summaries", stdout=StringIO())
+
+        self.client.login(username="admin", password="password")
+        response = self.client.get("/users/")
+        user = response.context["user_instances"][0]
+        self.assertEqual(user.form_summary.open_count, 1)
+        self.assertEqual(user.form_summary.completed_count, 1)
+
+    def test_rebuild_command(self):
+        create_completed_food_form(self.user)
+        create_completed_food_form(self.user)
+        FavouriteFood(user=self.user).save()
+        FormSummary.objects.create(user=self.user, open_count=40, completed_count=2)
+
+        output = StringIO()
+        call_command("rebuild_form_summaries", self.user.pk, stdout=output)
+
+        summary = self.summary()
+        self.assertEqual((summary.open_count, summary.completed_count), (1, 2))
+        self.assertTrue("1 form summaries rebuilt." in output.getvalue())
+        self.assertFalse(FormSummary.objects.filter(user=self.admin).exists())
+
+        call_command("rebuild_form_summaries", stdout=StringIO())
+        self.assertEqual(FormSummary.objects.get(user=self.admin).open_count, 0)
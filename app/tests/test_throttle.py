@@ -0,0 +1,131 @@
+import os
+import mock
+from django.conf import settings as django_settings
+from django.test import TestCase
+from django.test import Client, override_settings
+from django.contrib.auth.models import User
+from ..throttle import LocalBucketStore, SQLiteBucketStore
+from .test_helpers import TemporaryFilesMixin
+
+
+class TestLoginThrottle(TemporaryFilesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.override_settings(
+            LOGIN_THROTTLE_DB=os.path.join(
+                self.temporary_directory(), "throttle.sqlite3"
+            ),
+            LOGIN_THROTTLE_BURST=3,
+        )
+
+        self.user = User(username="user")
+        self.user.set_password("password")
+        self.user.save()
+
+    def login(self, username="user", password="wrong", ip="10.0.0.1"):
+        return Client().post(
+            "/", {"username": username, "password": password}, REMOTE_ADDR=ip
+        )
+
+    def test_rejects_before_authenticate(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 302)
+
+        with mock.patch("app.views.authenticate") as authenticate:
+            response = self.login()
+
+        authenticate.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "6")
+
+    def test_successful_logins_are_not_counted(self):
+        for _ in range(5):
+            response = self.login(password="password")
+            self.assertRedirects(response, "/dashboard/", fetch_redirect_response=False)
+
+    def test_keyed_by_ip_and_username(self):
+        for ip in ("10.0.0.1", "10.0.0.2", "10.0.0.3"):
+            self.login(ip=ip)
+
+        self.assertEqual(self.login(ip="10.0.0.4").status_code, 429)
+        self.assertEqual(self.login(username="other", ip="10.0.0.4").status_code, 302)
+
+        for username in ("a", "b", "c"):
+            self.login(username=username, ip="10.0.0.5")
+
+        self.assertEqual(self.login(username="d", ip="10.0.0.5").status_code, 429)
+
+    def test_sqlite_store_is_shared(self):
+        path = django_settings.LOGIN_THROTTLE_DB
+        worker1, worker2 = SQLiteBucketStore(path, 10), SQLiteBucketStore(path, 10)
+
+        self.assertEqual(worker1.take(["ip:1"], 1, 2, now=100), 0)
+        self.assertEqual(worker2.take(["ip:1"], 1, 2, now=100), 0)
+        self.assertEqual(worker1.take(["ip:1"], 1, 2, now=100), 1)
+        self.assertEqual(worker2.take(["ip:1"], 1, 2, now=101), 0)
+
+    def test_local_store_evicts_least_recently_used(self):
+        store = LocalBucketStore(max_buckets=2)
+        store.take(["a"], 1, 1, now=0)
+        store.take(["b"], 1, 1, now=0)
+        store.take(["c"], 1, 1, now=0)
+
+        self.assertEqual(list(store.buckets), ["b", "c"])
+        self.assertEqual(store.take(["a"], 1, 1, now=0), 0)
+
+    def test_sqlite_store_evicts_least_recently_used(self):
+        store = SQLiteBucketStore(django_settings.LOGIN_THROTTLE_DB, max_buckets=2)
+        store.take(["a"], 1, 1, now=0)
+        store.take(["b"], 1, 1, now=1)
+        store.take(["a"], 1, 1, now=2)
+        store.take(["c"], 1, 1, now=3)
+        self.assertEqual(self.bucket_keys(store), ["a", "c"])
+
+        for n in range(5):
+            store.take(["user:{}".format(n)], 1, 1, now=4 + n)
+
+        self.assertEqual(self.bucket_keys(store), ["user:3", "user:4"])
+
+        store.take(["c", "d"], 1, 1, now=10)
+        self.assertEqual(
+            store.connection.execute("SELECT COUNT(*) FROM buckets").fetchone(), (2,)
+        )
+
+    def bucket_keys(self, store):
+        keys = store.connection.execute("SELECT key FROM buckets ORDER BY key")
+        return [key for (key,) in keys]
+
+    def test_denied_attempts_take_no_tokens(self):
+        stores = [
+            LocalBucketStore(max_buckets=10),
+            SQLiteBucketStore(django_settings.LOGIN_THROTTLE_DB, max_buckets=10),
+        ]
+
+        for store in stores:
+            self.assertEqual(store.take(["ip:1", "user:a"], 1, 1, now=0), 0)
+            self.assertEqual(store.take(["ip:2", "user:a"], 1, 1, now=0), 1)
+            self.assertEqual(store.take(["ip:2", "user:b"], 1, 1, now=0), 0)
+
+    @override_settings(TRUSTED_PROXIES=["10.0.0.100"])
+    def test_client_ip_behind_trusted_proxy(self):
+        def login(username, forwarded_for, ip="10.0.0.100"):
+            return Client().post(
+                "/",
+                {"username": username, "password": "wrong"},
+                REMOTE_ADDR=ip,
+                HTTP_X_FORWARDED_FOR=forwarded_for,
+            )
+
+        # clients behind the proxy don't share its bucket
+        for n in range(5):
+            self.assertEqual(
+                login("a{}".format(n), "1.1.1.{}".format(n)).status_code, 302
+            )
+
+        for n in range(3):
+            self.assertEqual(login("b{}".format(n), "9.9.9.9").status_code, 302)
+
+        self.assertEqual(login("c", "9.9.9.9").status_code, 429)
+        # only the hop the proxy added is trusted, not what the client sent
+        self.assertEqual(login("d", "8.8.8.8, 9.9.9.9").status_code, 429)
+        self.assertEqual(login("e", "9.9.9.9", ip="10.0.0.101").status_code, 302)
@@ -0,0 +1,60 @@
+import datetime
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from ..forms import FoodForm, validate_food_rows
+from ..validations import date_validator, image_validator, phone_validator
+from .test_helpers import generate_food_form_values, jpeg_file
+
+
+class TestValidation(TestCase):
+    def test_validators(self):
+        phone_validator("07123456789")
+        date_validator(datetime.date.today())
+        image_validator(SimpleUploadedFile("photo.jpeg", b""))
+
+        with self.assertRaises(ValidationError):
+            phone_validator("7123456789")
+        with self.assertRaises(ValidationError):
+            date_validator(datetime.date.today() + datetime.timedelta(days=1))
+        with self.assertRaises(ValidationError):
+            image_validator(SimpleUploadedFile("photo.JPG", b""))
+
+    def test_batch_matches_food_form(self):
+        rows = [
+            generate_food_form_values(user=None, file_name="test.jpg"),
+            generate_food_form_values(
+                user=None, file_name="test.png", email="wrong", telephone="123"
+            ),
+            {"name": "x" * 31, "dob": "01/01/2999"},
+            generate_food_form_values(
+                user=None, file_name="test.jpg", telephone="07400000000000000000000"
+            ),
+            generate_food_form_values(
+                user=None, file_name="test.jpeg", email="a@b.c", dob="2010-02-30"
+            ),
+            generate_food_form_values(
+                user=None, file_name="test.txt", email=" ", food="f" * 101
+            ),
+            {"name": "   ", "email": "x" * 95 + "@b.com", "telephone": " 07400000000"},
+        ]
+        for row in rows:
+            row["photo"] = jpeg_file(row["photo"].name) if "photo" in row else None
+
+        results = validate_food_rows(rows)
+
+        for row, (cleaned_data, errors) in zip(rows, results):
+            form = FoodForm(row, {"photo": row["photo"]} if row["photo"] else {})
+            form.is_valid()
+            expected = {
+                name: messages
+                for name, messages in form.errors.items()
+                if name in FoodForm.Meta.fields
+            }
+            self.assertEqual(errors, expected)
+
+        self.assertEqual(results[0][1], {})
+        self.assertEqual(results[0][0]["telephone"], "07400000000")
+        self.assertEqual(
+            set(results[2][1]), {"name", "email", "telephone", "photo", "dob", "food"}
+        )
@@ -1,8 +1,19 @@
+import os
+import mock
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
-from django.test import Client
+from django.test import Client, override_settings
 from django.contrib.auth.models import User
-from ..models import FavouriteFood
-from .test_helpers import generate_food_form_values, create_completed_food_form
+from ..forms import FoodForm
+from ..models import FavouriteFood, FormSummary
+from ..helpers import complete_assignment
+from .test_helpers import (
+    TemporaryFilesMixin,
+    generate_food_form_values,
+    create_completed_food_form,
+    jpeg_file,
+)
 
 
 class TestLoginView(TestCase):
@@ -129,6 +140,51 @@ class TestDashboardView(TestCase):
         forms = response.context["forms"]
         self.assertEqual(len(forms), 2)
 
+    def test_pending_forms_are_cached(self):
+        cache.clear()
+        assigned_food_form = FavouriteFood(user=self.user)
+        assigned_food_form.save()
+        self.client.login(username="user", password="password")
+
+        with mock.patch.object(
+            FoodForm, "as_p", autospec=True, side_effect=FoodForm.as_p
+        ) as as_p:
+            self.client.get(self.url)
+            response = self.client.get(self.url)
+
+        self.assertEqual(as_p.call_count, 1)
+        content = response.content.decode("utf-8")
+        self.assertTrue("/complete-forms/{}".format(assigned_food_form.pk) in content)
+        self.assertTrue('name="telephone"' in content)
+
+    def test_pending_form_cache_tracks_profile_changes(self):
+        cache.clear()
+        FavouriteFood(user=self.user).save()
+        self.client.login(username="user", password="password")
+        self.client.get(self.url)
+
+        self.user.email = "changed@gmail.com"
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertTrue("changed@gmail.com" in response.content.decode("utf-8"))
+
+    def test_completed_form_invalidates_cache(self):
+        cache.clear()
+        assigned_food_form = FavouriteFood(user=self.user)
+        assigned_food_form.save()
+        self.client.login(username="user", password="password")
+        self.client.get(self.url)
+
+        key = "pending_form:{}:{}".format(self.user.pk, assigned_food_form.pk)
+        self.assertIsNotNone(cache.get(key))
+
+        values = generate_food_form_values(user=self.user, file_name="test.jpg")
+        self.client.post("/complete-forms/{}".format(assigned_food_form.pk), values)
+
+        self.assertIsNone(cache.get(key))
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context["forms"]), 0)
+
 
 class TestLogoutView(TestCase):
     def setUp(self):
@@ -213,6 +269,40 @@ class TestDisplayUsersView(TestCase):
         self.assertEqual(len(users), 1)
         self.assertEqual(users[0].username, "user")
 
+    def test_search_by_username_or_email_prefix(self):
+        User.objects.create(username="other", email="user.mail@gmail.com")
+        User.objects.create(username="someone", email="someone@gmail.com")
+        self.client.login(username="admin", password="password")
+
+        response = self.client.get(self.url, {"q": "us"})
+        users = response.context["user_instances"]
+        self.assertEqual([user.username for user in users], ["user", "other"])
+
+        response = self.client.get(self.url, {"q": "some"})
+        users = response.context["user_instances"]
+        self.assertEqual([user.username for user in users], ["someone"])
+
+    @override_settings(USERS_PAGE_SIZE=2)
+    def test_users_pagination(self):
+        User.objects.create(username="user2")
+        User.objects.create(username="user3")
+        self.client.login(username="admin", password="password")
+
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {"q": "user"})
+
+        users = response.context["user_instances"]
+        self.assertEqual([user.username for user in users], ["user", "user2"])
+        next_cursor = response.context["next_cursor"]
+        self.assertTrue(
+            "q=user&after={}".format(next_cursor) in response.content.decode()
+        )
+
+        response = self.client.get(self.url, {"q": "user", "after": next_cursor})
+        users = response.context["user_instances"]
+        self.assertEqual([user.username for user in users], ["user3"])
+        self.assertIsNone(response.context["next_cursor"])
+
 
 class TestAssignFormView(TestCase):
     def setUp(self):
@@ -287,8 +377,9 @@ class TestAssignFormView(TestCase):
         )
 
 
-class TestCompleteFormView(TestCase):
+class TestCompleteFormView(TemporaryFilesMixin, TestCase):
     def setUp(self):
+        super().setUp()
         self.clinet = Client()
         self.user = User(username="user")
         self.user.set_password("password")
@@ -435,6 +526,104 @@ class TestCompleteFormView(TestCase):
         self.assertEqual(message.tags, "success")
         self.assertTrue("You have successfully completed the form." in message.message)
 
+    def test_fake_jpeg_rejected(self):
+        self.client.login(username="user", password="password")
+        assigned_food_form = FavouriteFood(user=self.user)
+        assigned_food_form.save()
+
+        values = generate_food_form_values(user=self.user, file_name="test.jpg")
+        values["photo"] = SimpleUploadedFile("test.jpg", b"GIF89a not a jpeg")
+
+        response = self.client.post(
+            self.url(str(assigned_food_form.pk)), data=values, follow=True
+        )
+
+        messages = list(response.context.get("messages"))
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0].tags, "error")
+        self.assertTrue("Unsupported file content" in messages[0].message)
+        assigned_food_form.refresh_from_db()
+        self.assertFalse(assigned_food_form.completed)
+
+    @override_settings(PHOTO_UPLOAD_MAX_SIZE=1024)
+    def test_oversized_upload_rejected(self):
+        self.client.login(username="user", password="password")
+        assigned_food_form = FavouriteFood(user=self.user)
+        assigned_food_form.save()
+
+        values = generate_food_form_values(user=self.user, file_name="test.jpg")
+        values["photo"] = jpeg_file("test.jpg", size=(400, 400))
+
+        response = self.client.post(
+            self.url(str(assigned_food_form.pk)), data=values, follow=True
+        )
+
+        messages = list(response.context.get("messages"))
+        self.assertEqual(len(messages), 1)
+        self.assertTrue("Uploaded file is too large" in messages[0].message)
+        assigned_food_form.refresh_from_db()
+        self.assertFalse(assigned_food_form.completed)
+
+    def test_csrf_still_enforced(self):
+        client = Client(enforce_csrf_checks=True)
+        client.login(username="user", password="password")
+        assigned_food_form = FavouriteFood(user=self.user)
+        assigned_food_form.save()
+
+        values = generate_food_form_values(user=self.user, file_name="test.jpg")
+        response = client.post(self.url(str(assigned_food_form.pk)), data=values)
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_double_submit_completes_once(self):
+        assigned_food_form = FavouriteFood(user=self.user)
+        assigned_food_form.save()
+
+        def submit():
+            values = generate_food_form_values(user=self.user, file_name="test.jpg")
+            del values["photo"]
+            submitted_form = FoodForm(values, {"photo": jpeg_file("test.jpg")})
+            self.assertTrue(submitted_form.is_valid(), submitted_form.errors)
+            return complete_assignment(
+                submitted_form=submitted_form,
+                record_id=assigned_food_form.pk,
+                user=self.user,
+            )
+
+        self.assertEqual(submit(), "completed")
+        stored = os.listdir(os.path.join(self.media_root, "uploads"))
+        self.assertEqual(submit(), "already_completed")
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "uploads")), stored)
+
+        assigned_food_form.refresh_from_db()
+        self.assertTrue(assigned_food_form.completed)
+        self.assertTrue(assigned_food_form.photo.name.endswith(".jpg"))
+        self.assertTrue(
+            assigned_food_form.photo.storage.exists(assigned_food_form.photo.name)
+        )
+        self.assertEqual(FormSummary.objects.get(user=self.user).completed_count, 1)
+
+    def test_other_user_cannot_claim_form(self):
+        assigned_food_form = FavouriteFood(user=self.random_user)
+        assigned_food_form.save()
+
+        values = generate_food_form_values(user=self.user, file_name="test.jpg")
+        del values["photo"]
+        submitted_form = FoodForm(values, {"photo": jpeg_file("test.jpg")})
+        submitted_form.is_valid()
+
+        outcome = complete_assignment(
+            submitted_form=submitted_form,
+            record_id=assigned_food_form.pk,
+            user=self.user,
+        )
+
+        self.assertEqual(outcome, "unauthorized")
+        assigned_food_form.refresh_from_db()
+        self.assertFalse(assigned_food_form.completed)
+        self.assertIsNone(assigned_food_form.name)
+        self.assertEqual(os.listdir(self.media_root), [])
+
 
 class TestHistoryView(TestCase):
     def setUp(self):
@@ -492,3 +681,92 @@ class TestHistoryView(TestCase):
         self.assertEqual(len(response.templates), 2)
         self.assertEqual(response.templates[0].name, "history.html")
         self.assertEqual(response.templates[1].name, "base.html")
+
+    @override_settings(HISTORY_PAGE_SIZE=2)
+    def test_history_pagination(self):
+        self.client.login(username="admin", password="password")
+        forms = [create_completed_food_form(self.user1) for _ in range(3)]
+
+        response = self.client.get(self.url, follow=True)
+        self.assertEqual(response.status_code, 200)
+        foods = response.context["foods"]
+        self.assertEqual([food.pk for food in foods], [forms[0].pk, forms[1].pk])
+        self.assertEqual(response.context["next_cursor"], forms[1].pk)
+
+        response = self.client.get(
+            self.url, {"after": response.context["next_cursor"]}, follow=True
+        )
+        foods = response.context["foods"]
+        self.assertEqual([food.pk for food in foods], [forms[2].pk])
+        self.assertIsNone(response.context["next_cursor"])
+
+    @override_settings(HISTORY_STREAM_CHUNK_SIZE=2)
+    def test_history_streaming(self):
+        self.client.login(username="user1", password="password")
+        for _ in range(3):
+            create_completed_food_form(self.user1)
+        create_completed_food_form(self.user2)
+
+        response = self.client.get(self.url, {"stream": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        content = b"".join(response.streaming_content).decode("utf-8")
+        self.assertEqual(content.count("Favarioute Food:"), 3)
+        self.assertTrue("<p>3:</p>" in content)
+        self.assertTrue("List of Foods" in content)
+        self.assertTrue(content.rstrip().endswith("</html>"))
+
+
+class TestBulkAssignFormsView(TestCase):
+    def setUp(self):
+        self.url = "/assign-forms/bulk"
+        self.admin = User(username="admin", is_superuser=True)
+        self.admin.set_password("password")
+        self.admin.save()
+        self.user1 = User(username="user1")
+        self.user1.set_password("password")
+        self.user1.save()
+        self.user2 = User(username="user2")
+        self.user2.set_password("password")
+        self.user2.save()
+
+    def test_admin_required(self):
+        self.client.login(username="user1", password="password")
+        response = self.client.post(self.url, {"user_ids": [self.user1.pk]})
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(FavouriteFood.objects.exists())
+
+    def test_user_ids_or_filter_required(self):
+        self.client.login(username="admin", password="password")
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_user_ids(self):
+        self.client.login(username="admin", password="password")
+        response = self.client.post(self.url, {"user_ids": ["abc"]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_assign_by_user_ids(self):
+        self.client.login(username="admin", password="password")
+        response = self.client.post(
+            self.url,
+            {
+                "user_ids": [self.user1.pk, self.user2.pk, self.admin.pk, 4400],
+                "batch_size": 1,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"created": 2, "skipped": 2})
+        self.assertEqual(FavouriteFood.objects.filter(completed=False).count(), 2)
+
+    def test_assign_unassigned_users(self):
+        FavouriteFood(user=self.user1).save()
+        self.client.login(username="admin", password="password")
+
+        response = self.client.post(self.url, {"filter": "unassigned"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"created": 1, "skipped": 1})
+        self.assertEqual(FavouriteFood.objects.filter(user=self.user2).count(), 1)
+        self.assertEqual(FavouriteFood.objects.filter(user=self.user1).count(), 1)
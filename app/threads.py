@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .instrumentation import instrument_connections
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_VIEW_WORKERS, thread_name_prefix="async-views"
+        )
+
+    return _executor
+
+
+def shutdown_executor(wait=True):
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        _executor = None
+
+
+def _call(function, *args, **kwargs):
+    # pool threads keep their own connections between requests, so they are
+    # recycled here the way the request_started/finished signals do for WSGI
+    close_old_connections()
+
+    try:
+        with instrument_connections():
+            return function(*args, **kwargs)
+
+    finally:
+        close_old_connections()
+
+
+async def run_sync(function, *args, **kwargs):
+    return await sync_to_async(_call, thread_sensitive=False, executor=get_executor())(
+        function, *args, **kwargs
+    )
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+def refill(tokens, updated, now, rate, burst):
+    return min(burst, tokens + (now - updated) * rate)
+
+
+def take_from(tokens, rate):
+    # every bucket is checked before any is drawn from, so an attempt denied
+    # by one bucket doesn't also drain the others
+    retry_after = max(
+        ((1 - value) / rate for value in tokens.values() if value < 1), default=0
+    )
+
+    if not retry_after:
+        for key in tokens:
+            tokens[key] -= 1
+
+    return retry_after
+
+
+class LocalBucketStore:
+    # token buckets for this process only, least recently used evicted first
+    def __init__(self, max_buckets):
+        self.max_buckets = max_buckets
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, keys, rate, burst, now):
+        with self.lock:
+            tokens = {}
+
+            for key in keys:
+                stored, updated = self.buckets.pop(key, (burst, now))
+                tokens[key] = refill(stored, updated, now, rate, burst)
+
+            retry_after = take_from(tokens, rate)
+
+            for key, value in tokens.items():
+                self.buckets[key] = (value, now)
+
+            while len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+
+        return retry_after
+
+    def give(self, key, burst):
+        with self.lock:
+            if key in self.buckets:
+                tokens, updated = self.buckets[key]
+                self.buckets[key] = (min(burst, tokens + 1), updated)
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class SQLiteBucketStore:
+    # token buckets shared by every worker on the host through one SQLite file,
+    # least recently updated evicted first
+    def __init__(self, path, max_buckets):
+        self.path = path
+        self.max_buckets = max_buckets
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, "connection", None)
+
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS buckets_updated ON buckets (updated)"
+            )
+            self.local.connection = connection
+
+        return connection
+
+    def take(self, keys, rate, burst, now):
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+
+        try:
+            tokens = {}
+            added = False
+
+            for key in keys:
+                row = connection.execute(
+                    "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+
+                if row is None:
+                    added = True
+                    row = (burst, now)
+
+                tokens[key] = refill(row[0], row[1], now, rate, burst)
+
+            retry_after = take_from(tokens, rate)
+
+            connection.executemany(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in tokens.items()],
+            )
+
+            if added:
+                (count,) = connection.execute("SELECT COUNT(*) FROM buckets").fetchone()
+
+                if count > self.max_buckets:
+                    connection.execute(
+                        "DELETE FROM buckets WHERE rowid IN (SELECT rowid FROM "
+                        "buckets ORDER BY updated LIMIT ?)",
+                        (count - self.max_buckets,),
+                    )
+
+            connection.execute("COMMIT")
+
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        return retry_after
+
+    def give(self, key, burst):
+        self.connection.execute(
+            "UPDATE buckets SET tokens = MIN(?, tokens + 1) WHERE key = ?", (burst, key)
+        )
+
+    def clear(self):
+        self.connection.execute("DELETE FROM buckets")
+
+
+_stores = {}
+
+
+def get_store():
+    owner = (settings.LOGIN_THROTTLE_STORE, settings.LOGIN_THROTTLE_DB)
+
+    if owner not in _stores:
+        if settings.LOGIN_THROTTLE_STORE == "sqlite":
+            _stores[owner] = SQLiteBucketStore(
+                settings.LOGIN_THROTTLE_DB, settings.LOGIN_THROTTLE_MAX_BUCKETS
+            )
+
+        else:
+            _stores[owner] = LocalBucketStore(settings.LOGIN_THROTTLE_MAX_BUCKETS)
+
+    return _stores[owner]
+
+
+def client_ip(request):
+    # behind TRUSTED_PROXIES every request comes from the proxy, so the client
+    # is the last address in X-Forwarded-For that no trusted proxy added
+    address = request.META.get("REMOTE_ADDR", "")
+
+    if address not in settings.TRUSTED_PROXIES:
+        return address
+
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+
+    for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+        address = hop
+
+        if hop not in settings.TRUSTED_PROXIES:
+            break
+
+    return address
+
+
+def throttle_keys(request):
+    keys = ["ip:" + client_ip(request)]
+    username = request.POST.get("username", "").strip().lower()
+
+    if username:
+        keys.append("user:" + username)
+
+    return keys
+
+
+def take_tokens(keys):
+    return get_store().take(
+        keys, settings.LOGIN_THROTTLE_RATE, settings.LOGIN_THROTTLE_BURST, time.time()
+    )
+
+
+def give_tokens(keys):
+    store = get_store()
+
+    for key in keys:
+        store.give(key, settings.LOGIN_THROTTLE_BURST)
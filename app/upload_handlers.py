@@ -0,0 +1,120 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.files.uploadhandler import (
+    SkipFile,
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from django.http import HttpResponse
+
+JPEG_MAGIC = b"\xff\xd8\xff"
+
+
+class LimitedJPEGUploadHandler(TemporaryFileUploadHandler):
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.max_size = max_size or settings.PHOTO_UPLOAD_MAX_SIZE
+        self.error = None
+
+    def receive_data_chunk(self, raw_data, start):
+
+        if start == 0 and not raw_data.startswith(JPEG_MAGIC):
+            self.error = "Unsupported file content (upload jpg or jpeg files)."
+            raise SkipFile()
+
+        if start + len(raw_data) > self.max_size:
+            self.error = "Uploaded file is too large (maximum {} bytes).".format(
+                self.max_size
+            )
+            raise StopUpload(connection_reset=True)
+
+        return super().receive_data_chunk(raw_data, start)
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+class LimitedASGIHandler(ASGIHandler):
+    # Django's ASGI handler spools the whole body before the upload handlers
+    # see a byte, so oversized requests are refused while it is being read.
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await super().__call__(scope, receive, send)
+
+        max_size = settings.ASGI_REQUEST_MAX_SIZE
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+
+            if received > max_size:
+                raise RequestTooLarge()
+
+            return message
+
+        try:
+            if declared_size(scope) > max_size:
+                raise RequestTooLarge()
+
+            # the body is only read before the request is built, so nothing
+            # has been sent when this is raised
+            await super().__call__(scope, limited_receive, send)
+
+        except RequestTooLarge:
+            response = HttpResponse(
+                "Request body is too large (maximum {} bytes).".format(max_size),
+                status=413,
+            )
+            await self.send_response(response, send)
+
+    async def send_response(self, response, send):
+        chunks = getattr(response, "async_streaming_content", None)
+
+        if chunks is None:
+            return await super().send_response(response, send)
+
+        # what Django 4.2 does for async streaming content, which 3.1 can't
+        # iterate; the response is closed even if the client goes away
+        headers = [
+            (header.encode("ascii"), value.encode("latin1"))
+            for header, value in response.items()
+        ]
+        headers += [
+            (b"Set-Cookie", cookie.output(header="").encode("ascii").strip())
+            for cookie in response.cookies.values()
+        ]
+
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": response.status_code,
+                    "headers": headers,
+                }
+            )
+
+            async for chunk in chunks:
+                await send(
+                    {"type": "http.response.body", "body": chunk, "more_body": True}
+                )
+
+            await send({"type": "http.response.body"})
+
+        finally:
+            await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def declared_size(scope):
+    for name, value in scope.get("headers") or ():
+        if name.lower() == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return 0
+
+    return 0
@@ -1,20 +1,33 @@
-from django.urls import path
 from django.conf import settings
-from django.conf.urls.static import static
-from . import views
+from django.urls import path
+from . import api, async_views, views
+
+# core.asgi switches the I/O-bound pages to their async variants
+pages = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     path("", views.login_user, name="login"),
-    path("dashboard/", views.home, name="home"),
+    path("dashboard/", pages.home, name="home"),
     path("logout/", views.logout_user, name="logout"),
     path("users/", views.display_users, name="users"),
+    path("assign-forms/bulk", views.bulk_assign, name="bulk_assign_forms"),
     path("assign-forms/<int:pk>", views.assign_forms, name="assign_forms"),
     path(
         "complete-forms/<int:assigned_form_id>",
-        views.complete_forms,
+        pages.complete_forms,
         name="complete_forms",
     ),
-    path("history/", views.history, name="history"),
+    path("history/", pages.history, name="history"),
+    path("history/export", pages.export_history, name="export_history"),
+    path("photos/<int:pk>", pages.food_photo, name="food_photo"),
+    path(
+        "photos/<int:pk>/thumbnail",
+        pages.food_photo,
+        {"thumbnail": True},
+        name="food_thumbnail",
+    ),
+    path("metrics", views.metrics, name="metrics"),
+    path("api/pending", api.pending, name="api_pending"),
+    path("api/history", api.history, name="api_history"),
+    path("api/complete/<int:assigned_form_id>", api.complete, name="api_complete"),
 ]
-
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,24 +1,26 @@
 import os
 from django.forms import ValidationError
-from datetime import datetime, date
+from datetime import datetime
 import re
 
+# built once at import; these run for every submitted and imported form
+VALID_IMAGE_EXTENSIONS = frozenset((".jpg", ".jpeg"))
+
+_PHONE_RE = re.compile(r"^07\d{9}$")
+
 
 def image_validator(value):
     ext = os.path.splitext(value.name)[1]
-    valid = [".jpg", ".jpeg"]
-    if ext not in valid:
+    if ext not in VALID_IMAGE_EXTENSIONS:
         raise ValidationError("Unsupported file extension (upload jpg or jpeg files).")
 
 
 def date_validator(value):
-    dob = datetime(value.year, value.month, value.day)
-    present = datetime.now()
-    if dob > present:
+    # datetime.now().date() is quicker than date.today()
+    if value > datetime.now().date():
         raise ValidationError("Date of birth needs to be in the past.")
 
 
 def phone_validator(value):
-    is_correct = re.search(r"^07\d{9}$", value)
-    if not is_correct:
-        raise ValidationError("Telephone is in wrong format.")
\ No newline at end of file
+    if not _PHONE_RE.match(value):
+        raise ValidationError("Telephone is in wrong format.")
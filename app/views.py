@@ -1,43 +1,88 @@
+import uuid
+
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Count, Q
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.views.decorators.http import require_http_methods
 
 from .forms import FoodForm
-from .models import FavouriteFood
-from .decorators import require_auth, require_admin
+from .exports import (
+    EXPORT_FORMATS,
+    ExportError,
+    export_lines,
+    export_rows,
+    get_export_queryset,
+)
+from .models import FavouriteFood, FormSummary
+from .decorators import (
+    require_auth,
+    require_admin,
+    query_budget,
+    read_from_replica,
+    idempotent,
+    throttle_login,
+)
+from .instrumentation import span
+from .media import serve_media
+from .metrics import registry, render_metrics
+from .summaries import update_form_summaries
+from .upload_handlers import LimitedJPEGUploadHandler
 from .helpers import (
-    generate_forms_to_complete,
-    update_food_record,
+    render_forms_to_complete,
+    invalidate_pending_forms,
+    complete_assignment,
+    COMPLETION_ERRORS,
+    bulk_assign_forms,
+    get_history_queryset,
+    parse_cursor,
+    paginate_by_cursor,
+    search_users,
+    stream_history,
 )
 
 
 @require_http_methods(["GET"])
+@query_budget(queries=4)
 @require_auth(redirect_view="login")
 def home(request):
 
     if request.user.is_superuser:
-        return render(request, "admin_dashboard.html", {})
+        with span("render"):
+            return render(request, "admin_dashboard.html", {})
 
     else:
 
-        assigned_food_forms = FavouriteFood.objects.filter(
-            user=request.user, completed=False
+        assigned_food_forms = FavouriteFood.objects.for_user(
+            request.user, completed=False
         )
 
-        forms_to_complete = generate_forms_to_complete(
-            assigned_food_forms=assigned_food_forms, user=request.user
-        )
+        with span("form"):
+            forms_to_complete = render_forms_to_complete(
+                assigned_food_forms=assigned_food_forms, user=request.user
+            )
+
+        summary = FormSummary.objects.filter(user=request.user).first()
 
-        context = {"forms": forms_to_complete}
+        context = {
+            "forms": forms_to_complete,
+            "summary": summary,
+            "idempotency_key": uuid.uuid4().hex,
+        }
 
-        return render(request, "user_dashboard.html", context)
+        with span("render"):
+            return render(request, "user_dashboard.html", context)
 
 
 @require_http_methods(["GET", "POST"])
+@query_budget(queries=6)
+@throttle_login
 def login_user(request):
     if request.user.is_authenticated:
         return redirect("home")
@@ -46,7 +91,8 @@ def login_user(request):
 
         username = request.POST["username"]
         password = request.POST["password"]
-        user = authenticate(request, username=username, password=password)
+        with span("auth"):
+            user = authenticate(request, username=username, password=password)
 
         if user is None:
             messages.error(request, ("Invalid credentials!"))
@@ -57,10 +103,12 @@ def login_user(request):
         return redirect("home")
 
     else:
-        return render(request, "login.html", {})
+        with span("render"):
+            return render(request, "login.html", {})
 
 
 @require_http_methods(["POST"])
+@query_budget(queries=4)
 @require_auth()
 def logout_user(request):
     logout(request)
@@ -69,22 +117,38 @@ def logout_user(request):
 
 
 @require_http_methods(["GET"])
+@query_budget(queries=3)
 @require_auth(redirect_view="login")
 @require_admin()
+@read_from_replica
 def display_users(request):
 
-    users = User.objects.all().exclude(is_superuser=True)
+    query = request.GET.get("q", "").strip()
+    after = parse_cursor(request.GET.get("after"))
+
+    users = search_users(query)
+
+    if after:
+        users = users.filter(id__gt=after)
+
+    users, next_cursor = paginate_by_cursor(users, page_size=settings.USERS_PAGE_SIZE)
 
     context = {
         "user_instances": users,
+        "next_cursor": next_cursor,
+        "q": query,
+        "idempotency_key": uuid.uuid4().hex,
     }
 
-    return render(request, "users.html", context)
+    with span("render"):
+        return render(request, "users.html", context)
 
 
 @require_http_methods(["POST"])
+@query_budget(queries=9)
 @require_auth(message="Please login in!")
 @require_admin()
+@idempotent
 def assign_forms(request, pk=None):
 
     if pk:
@@ -94,8 +158,13 @@ def assign_forms(request, pk=None):
         if not user:
             return HttpResponse("User not found", status=400)
 
-        assigned_food_form = FavouriteFood(user=user)
-        assigned_food_form.save()
+        with transaction.atomic():
+            assigned_food_form = FavouriteFood(user=user)
+            assigned_food_form.save()
+            update_form_summaries([user.pk], opened=1)
+
+        invalidate_pending_forms(user.pk, [assigned_food_form.pk])
+        registry.inc("app_forms_assigned_total")
 
         messages.success(
             request,
@@ -108,32 +177,81 @@ def assign_forms(request, pk=None):
 
 
 @require_http_methods(["POST"])
+@query_budget(queries=16)
 @require_auth(message="Please login in!")
+@require_admin()
+@idempotent
+def bulk_assign(request):
+
+    user_ids = request.POST.getlist("user_ids")
+    unassigned_only = request.POST.get("filter") == "unassigned"
+
+    if not user_ids and not unassigned_only:
+        return HttpResponse("user ids or a filter are required", status=400)
+
+    try:
+        user_ids = [int(pk) for pk in user_ids] or None
+        batch_size = int(
+            request.POST.get("batch_size", settings.ASSIGN_FORMS_BATCH_SIZE)
+        )
+    except ValueError:
+        return HttpResponse("user ids and batch size must be integers", status=400)
+
+    if batch_size < 1:
+        return HttpResponse("batch size must be positive", status=400)
+
+    created, skipped = bulk_assign_forms(
+        user_ids=user_ids, unassigned_only=unassigned_only, batch_size=batch_size
+    )
+    registry.inc("app_forms_assigned_total", created)
+
+    return JsonResponse({"created": created, "skipped": skipped})
+
+
+# CSRF is checked in _complete_forms, after the upload handler is installed,
+# because the middleware check would parse the multipart body first; repeated
+# idempotency keys are replayed before either, so a duplicate never uploads
+@csrf_exempt
+@require_http_methods(["POST"])
+@query_budget(queries=8)
+@require_auth(message="Please login in!")
+@idempotent
 def complete_forms(request, assigned_form_id=None):
 
+    upload_handler = LimitedJPEGUploadHandler(request)
+    request.upload_handlers = [upload_handler]
+
+    return _complete_forms(request, assigned_form_id, upload_handler)
+
+
+@csrf_protect
+def _complete_forms(request, assigned_form_id, upload_handler):
+
     if assigned_form_id:
 
         submitted_form = FoodForm(request.POST, request.FILES)
 
-        if not submitted_form.is_valid():
-            messages.error(request, submitted_form.errors)
+        if upload_handler.error:
+            messages.error(request, upload_handler.error)
             return redirect("/dashboard")
 
-        food = FavouriteFood.objects.filter(pk=assigned_form_id).first()
-
-        if not food:
-            return HttpResponse("No assigned form was found!", status=400)
+        with span("form"):
+            is_valid = submitted_form.is_valid()
 
-        if food.completed:
-            return HttpResponse("This form has already been compeleted!", status=400)
-
-        if food.user != request.user:
-            return HttpResponse("Unauthorized!", status=401)
+        if not is_valid:
+            messages.error(request, submitted_form.errors)
+            return redirect("/dashboard")
 
-        update_food_record(
-            submitted_form=submitted_form, user=request.user, record_id=assigned_form_id
+        outcome = complete_assignment(
+            submitted_form=submitted_form,
+            user=request.user,
+            record_id=assigned_form_id,
         )
 
+        if outcome in COMPLETION_ERRORS:
+            message, status = COMPLETION_ERRORS[outcome]
+            return HttpResponse(message, status=status)
+
         messages.success(request, ("You have successfully completed the form."))
         return redirect("/dashboard")
 
@@ -141,15 +259,107 @@ def complete_forms(request, assigned_form_id=None):
 
 
 @require_http_methods(["GET"])
+@query_budget(queries=4)
 @require_auth(redirect_view="login")
+@read_from_replica
 def history(request):
 
-    if request.user.is_superuser:
-        foods = FavouriteFood.objects.filter(completed=True)
+    foods = get_history_queryset(request.user)
+    after = parse_cursor(request.GET.get("after"))
 
-    else:
-        foods = FavouriteFood.objects.filter(user=request.user, completed=True)
+    if after:
+        foods = foods.filter(id__gt=after)
 
-    context = {"foods": foods}
+    if request.GET.get("stream"):
+        return stream_history(
+            request, foods, chunk_size=settings.HISTORY_STREAM_CHUNK_SIZE
+        )
+
+    foods, next_cursor = paginate_by_cursor(
+        foods, page_size=settings.HISTORY_PAGE_SIZE
+    )
+
+    context = {"foods": foods, "next_cursor": next_cursor}
+
+    with span("render"):
+        return render(request, "history.html", context)
+
+
+@require_http_methods(["GET"])
+@query_budget(queries=3)
+@require_auth()
+@require_admin()
+@read_from_replica
+def export_history(request):
+
+    export_format = request.GET.get("format", "csv")
+
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponse("format must be csv or jsonl", status=400)
+
+    try:
+        foods = get_export_queryset(
+            since=request.GET.get("since"),
+            until=request.GET.get("until"),
+            username=request.GET.get("user"),
+        )
+    except ExportError as error:
+        return HttpResponse(str(error), status=400)
+
+    # the rows are read after the view returns, so the database is fixed now
+    foods = foods.using(foods.db)
+    rows = export_rows(
+        foods,
+        chunk_size=settings.EXPORT_CHUNK_SIZE,
+        base_url=request.build_absolute_uri("/")[:-1],
+    )
+
+    response = StreamingHttpResponse(
+        export_lines(rows, export_format), content_type=EXPORT_FORMATS[export_format]
+    )
+    response["Content-Disposition"] = 'attachment; filename="history.{}"'.format(
+        export_format
+    )
+
+    return response
+
+
+@require_http_methods(["GET", "HEAD"])
+@query_budget(queries=3)
+@require_auth(redirect_view="login")
+def food_photo(request, pk=None, thumbnail=False):
+
+    food = FavouriteFood.objects.filter(pk=pk).only("user_id", "photo", "thumbnail")
+    food = food.first()
+
+    if not food or not food.photo:
+        return HttpResponse("Photo not found", status=404)
+
+    if food.user_id != request.user.pk and not request.user.is_superuser:
+        return HttpResponse("Unauthorized!", status=401)
+
+    if thumbnail and food.thumbnail:
+        return serve_media(request, food.thumbnail)
+
+    return serve_media(request, food.photo)
+
+
+@require_http_methods(["GET"])
+@query_budget(queries=3)
+@require_auth()
+@require_admin()
+def metrics(request):
+
+    counts = FavouriteFood.objects.aggregate(
+        open=Count("pk", filter=Q(completed=False)),
+        completed=Count("pk", filter=Q(completed=True)),
+    )
+
+    gauges = {
+        "app_forms_open": counts["open"],
+        "app_forms_completed": counts["completed"],
+    }
 
-    return render(request, "history.html", context)
+    return HttpResponse(
+        render_metrics(gauges), content_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,23 @@
+"""
+ASGI config for mysite project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
+"""
+
+import os
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+os.environ.setdefault("ASYNC_VIEWS", "1")
+
+# what django.core.asgi.get_asgi_application does, with a handler that refuses
+# oversized bodies before spooling them
+django.setup(set_prefix=False)
+
+from app.upload_handlers import LimitedASGIHandler  # noqa: E402
+
+application = LimitedASGIHandler()